@@ -0,0 +1,200 @@
+import os
+import re
+import unicodedata
+import zlib
+
+import numpy as np
+import pandas as pd
+
+
+# ======================
+# CONFIG
+# ======================
+
+INPUT_CSV = "augmented_output/reviews_augmented.csv"
+
+NGRAM = 3
+NUM_PERM = 64
+SEED = 1
+
+# jaccard ước lượng trên char n-gram
+DUP_THRESHOLD = 0.8      # >= → gần như copy → bỏ
+DRIFT_THRESHOLD = 0.15   # <  → lệch nghĩa quá xa → gắn cờ
+
+CHUNK_SIZE = 50000
+
+MERSENNE = (1 << 31) - 1
+
+_rng = np.random.default_rng(SEED)
+PERM_A = _rng.integers(1, MERSENNE, NUM_PERM, dtype=np.uint64)
+PERM_B = _rng.integers(0, MERSENNE, NUM_PERM, dtype=np.uint64)
+
+
+# ======================
+# MINHASH
+# ======================
+
+def normalize(text):
+    text = unicodedata.normalize("NFC", str(text)).lower()
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def shingles(text):
+    text = f" {normalize(text)} "
+
+    grams = {text[i:i + NGRAM] for i in range(max(len(text) - NGRAM + 1, 1))}
+
+    return np.fromiter(
+        (zlib.crc32(g.encode("utf-8")) for g in grams),
+        dtype=np.uint64,
+        count=len(grams)
+    )
+
+
+def signatures(texts):
+    sigs = np.empty((len(texts), NUM_PERM), dtype=np.uint32)
+
+    for i, text in enumerate(texts):
+        x = shingles(text) % MERSENNE
+        # (n_shingle, NUM_PERM) → min theo shingle
+        sigs[i] = ((x[:, None] * PERM_A + PERM_B) % MERSENNE).min(axis=0)
+
+    return sigs
+
+
+def pair_similarity(sig_a, sig_b):
+    # jaccard ước lượng cho từng cặp hàng
+    return (sig_a == sig_b).mean(axis=1)
+
+
+# ======================
+# FILTER
+# ======================
+
+def filter_augmented(df, dup_threshold=DUP_THRESHOLD, drift_threshold=DRIFT_THRESHOLD):
+
+    # giữ nguyên cột input → file output vẫn có header đầy đủ
+    if df.empty:
+        return df.assign(
+            sim_original=pd.Series(dtype=float, index=df.index),
+            drift=pd.Series(dtype=bool, index=df.index),
+        )
+
+    df = df.reset_index(drop=True)
+
+    orig_sig = signatures(df["original"].tolist())
+    aug_sig = signatures(df["augmented"].tolist())
+
+    sim = pair_similarity(orig_sig, aug_sig)
+
+    keep = sim < dup_threshold
+
+    # rewrite gần trùng nhau trong cùng 1 câu gốc → giữ bản đầu
+    for _, idx in df.groupby("source_index", sort=False).indices.items():
+
+        idx = idx[keep[idx]]
+
+        if len(idx) < 2:
+            continue
+
+        group = aug_sig[idx]
+
+        # (m, m) ma trận similarity của nhóm, m ~ AUG_PER_SAMPLE
+        pairwise = (group[:, None, :] == group[None, :, :]).mean(axis=2)
+
+        kept = []
+        for j in range(len(idx)):
+            if all(pairwise[j, k] < dup_threshold for k in kept):
+                kept.append(j)
+            else:
+                keep[idx[j]] = False
+
+    out = df[keep].copy()
+    out["sim_original"] = sim[keep].round(3)
+    out["drift"] = out["sim_original"] < drift_threshold
+
+    return out
+
+
+# đọc theo chunk, giữ nguyên nhóm source_index nằm vắt qua 2 chunk
+def filter_file(input_csv, output_csv, chunk_size=CHUNK_SIZE):
+
+    # output bị xoá trước khi đọc input → trùng đường dẫn là mất input
+    if os.path.abspath(output_csv) == os.path.abspath(input_csv):
+        raise ValueError(f"Output trùng input: {input_csv}")
+
+    if os.path.exists(output_csv):
+        os.remove(output_csv)
+
+    total = kept = drift = 0
+    carry = None
+    columns = None
+
+    def flush(part):
+        nonlocal kept, drift
+
+        out = filter_augmented(part)
+
+        out.to_csv(
+            output_csv,
+            mode="a",
+            header=not os.path.exists(output_csv),
+            index=False
+        )
+
+        kept += len(out)
+        drift += int(out["drift"].sum())
+
+    for chunk in pd.read_csv(input_csv, chunksize=chunk_size):
+
+        columns = chunk.columns
+
+        # file chỉ có header
+        if chunk.empty:
+            continue
+
+        total += len(chunk)
+
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+
+        last = chunk["source_index"].iloc[-1]
+        tail = chunk["source_index"] == last
+
+        carry = chunk[tail]
+        chunk = chunk[~tail]
+
+        if not chunk.empty:
+            flush(chunk)
+
+    if carry is not None and not carry.empty:
+        flush(carry)
+
+    if not os.path.exists(output_csv) and columns is not None:
+        flush(pd.DataFrame(columns=columns))
+
+    print(f"Tổng rewrite: {total}")
+    print(f"Giữ lại:      {kept} (bỏ {total - kept} gần trùng)")
+    print(f"Drift:        {drift}")
+    print(f"💾 {output_csv}")
+
+
+# ======================
+# CLI
+# ======================
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", "-i", default=INPUT_CSV)
+    parser.add_argument("--output", "-o")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    args = parser.parse_args()
+
+    base, ext = os.path.splitext(args.input)
+    output = args.output or f"{base}_filtered{ext or '.csv'}"
+
+    filter_file(args.input, output, args.chunk_size)
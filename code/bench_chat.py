@@ -0,0 +1,206 @@
+import asyncio
+import json
+import os
+import time
+
+import pandas as pd
+from playwright.async_api import async_playwright
+
+import chat_standin
+import data_aug_playwright
+import label_data
+
+
+# ======================
+# CONFIG
+# ======================
+
+INPUT_FILE = "output_labeled/old/11k_google_maps_reviews.csv"
+BENCH_DIR = "bench_output"
+
+N_REVIEWS = 200
+
+
+# ======================
+# LABEL BENCH
+# ======================
+
+# cùng cách đóng batch theo budget ký tự như label_rows
+async def bench_labels(page, texts):
+
+    budget = label_data.new_budget()
+
+    batches = retries = dead = 0
+    start = time.time()
+
+    i = 0
+
+    while i < len(texts):
+
+        batch = [texts[i]]
+        i += 1
+
+        while i < len(texts) and not label_data.batch_is_full(batch, texts[i], budget):
+            batch.append(texts[i])
+            i += 1
+
+        stats = {}
+        t = time.time()
+
+        labels = await label_data.generate_labels_batch(page, batch, stats)
+
+        label_data.update_budget(budget, time.time() - t, stats)
+
+        batches += 1
+        retries += stats.get("attempts", 1) - 1
+        dead += sum(lab is None for lab in labels)
+
+    return report("generate_labels_batch", len(texts), batches, retries, dead, time.time() - start)
+
+
+# ======================
+# AUGMENT BENCH
+# ======================
+
+# như vòng lặp run() của data_aug_playwright: batch lỗi → reload, thử lại
+async def bench_augment(page, texts):
+
+    batches = retries = dead = 0
+    start = time.time()
+
+    for s in range(0, len(texts), data_aug_playwright.BATCH_SIZE):
+
+        batch = texts[s:s + data_aug_playwright.BATCH_SIZE]
+
+        batches += 1
+
+        for attempt in range(label_data.MAX_RETRY):
+            try:
+                results = await data_aug_playwright.generate_batch(page, batch)
+
+                # thiếu câu gốc / thiếu rewrite → tính là hỏng
+                if len(results) != len(batch) or any(
+                    len(r) != data_aug_playwright.AUG_PER_SAMPLE for r in results
+                ):
+                    raise ValueError("wrong result shape")
+
+                break
+
+            except Exception as e:
+                print("Batch failed:", e)
+                retries += 1
+                await page.goto(data_aug_playwright.CHATGPT_URL)
+        else:
+            dead += len(batch)
+
+    return report("generate_batch", len(texts), batches, retries, dead, time.time() - start)
+
+
+# ======================
+# REPORT
+# ======================
+
+def report(name, n, batches, retries, dead, wall):
+
+    result = {
+        "function": name,
+        "reviews": n,
+        "batches": batches,
+        "wall_s": round(wall, 1),
+        "batches_per_min": round(batches / wall * 60, 2) if wall else None,
+        "retries_per_batch": round(retries / batches, 2) if batches else None,
+        "s_per_1000_reviews": round(wall / n * 1000, 1) if n else None,
+        "failed_reviews": dead,
+    }
+
+    print("\n📊 " + json.dumps(result, ensure_ascii=False))
+
+    return result
+
+
+# ======================
+# MAIN
+# ======================
+
+async def run(texts, cfg, targets, headless=True):
+
+    os.makedirs(BENCH_DIR, exist_ok=True)
+
+    server, url = chat_standin.start(cfg, port=0)
+
+    # trỏ 2 script vào stand-in, dead-letter ra thư mục bench
+    label_data.CHATGPT_URL = url
+    data_aug_playwright.CHATGPT_URL = url
+    label_data.DEAD_LETTER_FILE = os.path.join(BENCH_DIR, "dead_letter.csv")
+
+    results = []
+
+    async with async_playwright() as p:
+
+        browser = await p.chromium.launch(headless=headless)
+        page = await browser.new_page()
+
+        if "label" in targets:
+            await page.goto(url)
+            results.append(await bench_labels(page, texts))
+
+        if "augment" in targets:
+            await page.goto(url)
+            results.append(await bench_augment(page, texts))
+
+        await browser.close()
+
+    server.shutdown()
+
+    print("\nStand-in:", json.dumps(cfg["stats"], ensure_ascii=False))
+
+    out = pd.DataFrame(results).assign(
+        latency=cfg["latency"],
+        malformed_rate=cfg["malformed_rate"],
+        stream_chars=cfg["stream_chars"],
+        stream_ms=cfg["stream_ms"],
+    )
+
+    path = os.path.join(BENCH_DIR, "bench_chat.csv")
+    out.to_csv(path, mode="a", header=not os.path.exists(path), index=False)
+
+    print(f"💾 {path}")
+
+    return out
+
+
+# ======================
+# CLI
+# ======================
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", "-i", default=INPUT_FILE)
+    parser.add_argument("--n", type=int, default=N_REVIEWS)
+    parser.add_argument("--target", choices=["label", "augment", "all"], default="all")
+    parser.add_argument("--latency", type=float, default=chat_standin.LATENCY)
+    parser.add_argument("--jitter", type=float, default=chat_standin.JITTER)
+    parser.add_argument("--stream-chars", type=int, default=chat_standin.STREAM_CHARS)
+    parser.add_argument("--stream-ms", type=int, default=chat_standin.STREAM_MS)
+    parser.add_argument("--malformed-rate", type=float, default=chat_standin.MALFORMED_RATE)
+    parser.add_argument("--seed", type=int, default=chat_standin.SEED)
+    parser.add_argument("--headed", action="store_true")
+
+    args = parser.parse_args()
+
+    texts = (
+        pd.read_csv(args.input)["text"].dropna().astype(str)
+        .head(args.n).tolist()
+    )
+
+    cfg = chat_standin.new_config(
+        args.latency, args.jitter, args.stream_chars,
+        args.stream_ms, args.malformed_rate, args.seed
+    )
+
+    targets = ["label", "augment"] if args.target == "all" else [args.target]
+
+    asyncio.run(run(texts, cfg, targets, headless=not args.headed))
@@ -0,0 +1,108 @@
+# ======================
+# CONFIG
+# ======================
+
+# dùng chung cho label_data.py và data_aug_playwright.py (cùng giao diện ChatGPT)
+
+REPLY_QUIET_MS = 300
+
+# icon "đang trả lời" khi model còn stream
+WAIT_ICON = 'svg use[href*="#bbf3a9"]'
+
+# fallback cuối chỉ lấy tin nhắn của assistant: "article" trơn bắt cả prompt
+# vừa gửi khi ChatGPT đổi class markdown/prose
+REPLY_SELECTORS = [
+    "div.markdown",
+    "div.prose",
+    '[data-message-author-role="assistant"]',
+]
+
+REPLY_WATCHER_JS = """
+([waitIcon, replySelectors, quietMs, timeoutMs]) => new Promise((resolve, reject) => {
+
+    const lastNewReply = () => {
+        for (const sel of replySelectors) {
+            const nodes = Array.from(document.querySelectorAll(sel))
+                .filter(n => !n.hasAttribute("data-seen"));
+            if (nodes.length > 0) {
+                return nodes[nodes.length - 1];
+            }
+        }
+        return null;
+    };
+
+    let quietTimer = null;
+    let started = false;
+
+    const finish = (fn, value) => {
+        observer.disconnect();
+        clearTimeout(quietTimer);
+        clearTimeout(deadline);
+        fn(value);
+    };
+
+    const check = () => {
+        clearTimeout(quietTimer);
+
+        if (document.querySelector(waitIcon)) {
+            started = true;
+            return;
+        }
+
+        const node = lastNewReply();
+        const text = node ? node.innerText.trim() : "";
+
+        if (!text) {
+            return;
+        }
+
+        // stream đã đóng: không còn icon và không có mutation mới.
+        // chưa thấy icon lần nào → chờ lâu hơn để không bắt nhầm prompt
+        const wait = started ? quietMs : quietMs * 10;
+        quietTimer = setTimeout(() => finish(resolve, text), wait);
+    };
+
+    const observer = new MutationObserver(check);
+
+    observer.observe(document.body, {
+        childList: true,
+        subtree: true,
+        characterData: true,
+        attributes: true,
+    });
+
+    const deadline = setTimeout(
+        () => finish(reject, new Error("Generation timeout")),
+        timeoutMs
+    );
+
+    // reply có thể đã xong trước khi observer được gắn
+    check();
+})
+"""
+
+MARK_SEEN_JS = """
+(replySelectors) => {
+    for (const sel of replySelectors) {
+        document.querySelectorAll(sel)
+            .forEach(n => n.setAttribute("data-seen", "1"));
+    }
+}
+"""
+
+
+# ======================
+# REPLY
+# ======================
+
+# đánh dấu các reply cũ, gọi TRƯỚC khi gửi prompt
+async def mark_replies_seen(page):
+    await page.evaluate(MARK_SEEN_JS, REPLY_SELECTORS)
+
+
+# chờ event DOM thay vì polling, trả về text của reply mới
+async def wait_for_reply(page, timeout=120):
+    return await page.evaluate(
+        REPLY_WATCHER_JS,
+        [WAIT_ICON, REPLY_SELECTORS, REPLY_QUIET_MS, timeout * 1000]
+    )
@@ -0,0 +1,285 @@
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# ======================
+# CONFIG
+# ======================
+
+HOST = "127.0.0.1"
+PORT = 8765
+
+# giây chờ trước khi bắt đầu stream (+- JITTER)
+LATENCY = 3.0
+JITTER = 1.0
+
+# stream reply theo từng khúc STREAM_CHARS ký tự, cách nhau STREAM_MS
+STREAM_CHARS = 40
+STREAM_MS = 50
+
+# tỉ lệ reply hỏng, chia đều cho các kiểu trong MALFORMED_KINDS
+MALFORMED_RATE = 0.1
+MALFORMED_KINDS = ["truncated", "missing_item", "bad_value", "prose"]
+
+SEED = 0
+
+
+# ======================
+# PAGE
+# ======================
+
+# cùng selector với ChatGPT: ô nhập contenteditable, icon chờ
+# svg use[href*="#bbf3a9"] khi đang stream, reply trong article > div.markdown,
+# mỗi article ghi data-message-author-role như ChatGPT (xem chat_reply.py)
+PAGE_HTML = """<!doctype html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>chat stand-in</title>
+<style>
+  body { font-family: sans-serif; max-width: 900px; margin: 0 auto; }
+  article { border-bottom: 1px solid #ddd; padding: 8px; white-space: pre-wrap; }
+  #prompt { border: 1px solid #888; min-height: 40px; padding: 6px; margin: 8px 0; }
+</style>
+</head>
+<body>
+<svg style="display:none"><symbol id="bbf3a9"><rect width="10" height="10"/></symbol></svg>
+<main id="thread"></main>
+<div id="status"></div>
+<div id="prompt" contenteditable="true"></div>
+<script>
+const STREAM_CHARS = __STREAM_CHARS__;
+const STREAM_MS = __STREAM_MS__;
+
+const thread = document.getElementById("thread");
+const status = document.getElementById("status");
+const input = document.getElementById("prompt");
+
+const article = (role, cls) => {
+    const a = document.createElement("article");
+    a.setAttribute("data-message-author-role", role);
+    const d = document.createElement("div");
+    if (cls) d.className = cls;
+    a.appendChild(d);
+    thread.appendChild(a);
+    return d;
+};
+
+input.addEventListener("keydown", async (ev) => {
+    if (ev.key !== "Enter" || ev.shiftKey) return;
+    ev.preventDefault();
+
+    const prompt = input.innerText;
+    input.innerText = "";
+
+    article("user", "").innerText = prompt;
+
+    status.innerHTML = '<svg width="16" height="16"><use href="#bbf3a9"></use></svg>';
+
+    const res = await fetch("/reply", { method: "POST", body: prompt });
+    const reply = await res.text();
+
+    const out = article("assistant", "markdown");
+    let pos = 0;
+
+    const timer = setInterval(() => {
+        pos += STREAM_CHARS;
+        out.innerText = reply.slice(0, pos);
+        if (pos >= reply.length) {
+            clearInterval(timer);
+            status.innerHTML = "";
+        }
+    }, STREAM_MS);
+});
+</script>
+</body>
+</html>
+"""
+
+
+# ======================
+# REPLY
+# ======================
+
+LABEL_DATA_RE = re.compile(r"DỮ LIỆU:\s*(\[[\s\S]*\])\s*$")
+AUG_INPUT_RE = re.compile(r"Input:\s*(\[[\s\S]*?\])\s*\n\s*Yêu cầu output")
+AUG_COUNT_RE = re.compile(r"viết lại thành (\d+) câu")
+
+
+def label_reply(items, rng):
+    return {
+        "results": [
+            {
+                "id": item["id"],
+                "food": rng.choice([0, 1, 2, 3]),
+                "service": rng.choice([0, 1, 2, 3]),
+                "place": rng.choice([0, 1, 2, 3]),
+                "price": rng.choice([0, 1, 2, 3]),
+            }
+            for item in items
+        ]
+    }
+
+
+def augment_reply(texts, n, rng):
+    return {
+        "results": [
+            [f"{t} (cách viết {k + 1})" for k in range(n)]
+            for t in texts
+        ]
+    }
+
+
+def corrupt(data, kind, rng):
+
+    results = data["results"]
+
+    if kind == "missing_item" and len(results) > 1:
+        results.pop(rng.randrange(len(results)))
+
+    elif kind == "bad_value" and results and isinstance(results[0], dict):
+        results[rng.randrange(len(results))]["food"] = 7
+
+    text = json.dumps(data, ensure_ascii=False)
+
+    if kind == "truncated":
+        return text[:max(1, len(text) * 2 // 3)]
+
+    if kind == "prose":
+        return f"Đây là kết quả:\n```json\n{text}\n```\nHy vọng hữu ích!"
+
+    return text
+
+
+def make_reply(prompt, cfg, rng):
+
+    m = LABEL_DATA_RE.search(prompt)
+
+    if m:
+        data = label_reply(json.loads(m.group(1)), rng)
+    else:
+        m = AUG_INPUT_RE.search(prompt)
+        n = AUG_COUNT_RE.search(prompt)
+
+        if not m:
+            return "Xin lỗi, tôi không hiểu yêu cầu."
+
+        data = augment_reply(json.loads(m.group(1)), int(n.group(1)) if n else 10, rng)
+
+    cfg["stats"]["replies"] += 1
+
+    if rng.random() < cfg["malformed_rate"]:
+        kind = rng.choice(MALFORMED_KINDS)
+        cfg["stats"]["malformed"][kind] = cfg["stats"]["malformed"].get(kind, 0) + 1
+        return corrupt(data, kind, rng)
+
+    return json.dumps(data, ensure_ascii=False, indent=2)
+
+
+# ======================
+# SERVER
+# ======================
+
+def new_config(latency=LATENCY, jitter=JITTER, stream_chars=STREAM_CHARS,
+               stream_ms=STREAM_MS, malformed_rate=MALFORMED_RATE, seed=SEED):
+    return {
+        "latency": latency,
+        "jitter": jitter,
+        "stream_chars": stream_chars,
+        "stream_ms": stream_ms,
+        "malformed_rate": malformed_rate,
+        "rng": random.Random(seed),
+        "lock": threading.Lock(),
+        "stats": {"replies": 0, "malformed": {}},
+    }
+
+
+def make_handler(cfg):
+
+    page = (
+        PAGE_HTML
+        .replace("__STREAM_CHARS__", str(cfg["stream_chars"]))
+        .replace("__STREAM_MS__", str(cfg["stream_ms"]))
+        .encode("utf-8")
+    )
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def send(self, body, content_type):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self.send(page, "text/html; charset=utf-8")
+
+        def do_POST(self):
+            prompt = self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8")
+
+            with cfg["lock"]:
+                rng = cfg["rng"]
+                delay = max(0.0, cfg["latency"] + rng.uniform(-cfg["jitter"], cfg["jitter"]))
+                reply = make_reply(prompt, cfg, rng)
+
+            time.sleep(delay)
+
+            self.send(reply.encode("utf-8"), "text/plain; charset=utf-8")
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+# chạy nền trong thread, trả về (server, url)
+def start(cfg=None, host=HOST, port=PORT):
+
+    cfg = cfg or new_config()
+
+    server = ThreadingHTTPServer((host, port), make_handler(cfg))
+    server.cfg = cfg
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, f"http://{host}:{server.server_address[1]}/"
+
+
+# ======================
+# CLI
+# ======================
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--latency", type=float, default=LATENCY)
+    parser.add_argument("--jitter", type=float, default=JITTER)
+    parser.add_argument("--stream-chars", type=int, default=STREAM_CHARS)
+    parser.add_argument("--stream-ms", type=int, default=STREAM_MS)
+    parser.add_argument("--malformed-rate", type=float, default=MALFORMED_RATE)
+    parser.add_argument("--seed", type=int, default=SEED)
+
+    args = parser.parse_args()
+
+    cfg = new_config(
+        args.latency, args.jitter, args.stream_chars,
+        args.stream_ms, args.malformed_rate, args.seed
+    )
+
+    server, url = start(cfg, port=args.port)
+
+    print(f"💬 Stand-in chat: {url} (Ctrl+C để dừng)")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
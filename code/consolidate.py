@@ -0,0 +1,291 @@
+import glob
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+
+# ======================
+# CONFIG
+# ======================
+
+LABEL_COLS = ["food", "service", "place", "price"]
+
+# mỗi target = 1 store đã dedup, thay cho notebook random.ipynb tương ứng
+TARGETS = {
+    "reviews": {
+        "pattern": "output/google_maps_reviews*.csv",
+        "store": "output/clean_google_maps_reviews.csv",
+        "key_cols": ["place_name", "user", "text"],
+        "keep_cols": ["place_name", "user", "rating", "time", "text"],
+        "add_source": True,
+    },
+    "labeled": {
+        "pattern": "output_labeled/labeled*.csv",
+        "store": "output_labeled/11k_google_maps_reviews.csv",
+        "key_cols": ["text"],
+        "keep_cols": ["text"] + LABEL_COLS,
+        "add_source": False,
+    },
+}
+
+
+# ======================
+# MANIFEST
+# ======================
+
+def manifest_path(store):
+    return store + ".manifest.json"
+
+
+def keys_path(store):
+    return store + ".keys"
+
+
+# key riêng trong manifest: kích thước store + .keys lúc ghi manifest lần cuối.
+# manifest ghi sau cùng (os.replace) → phần dư quá kích thước này là của
+# lần ingest bị ngắt giữa chừng, file nguồn của nó chưa vào manifest
+STATE_KEY = "__store__"
+
+
+def load_manifest(store):
+
+    path = manifest_path(store)
+
+    if not os.path.exists(path):
+        return {}
+
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(store, manifest):
+
+    tmp = manifest_path(store) + ".tmp"
+
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+
+    os.replace(tmp, manifest_path(store))
+
+
+def file_hash(path):
+
+    h = hashlib.sha1()
+
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+
+    return h.hexdigest()
+
+
+def file_entry(path, old=None):
+
+    st = os.stat(path)
+
+    # size + mtime không đổi → khỏi hash lại
+    if old and old["size"] == st.st_size and old["mtime"] == st.st_mtime:
+        return old
+
+    return {"size": st.st_size, "mtime": st.st_mtime, "sha1": file_hash(path)}
+
+
+def store_sizes(store):
+    return {
+        "store": os.path.getsize(store) if os.path.exists(store) else 0,
+        "keys": os.path.getsize(keys_path(store)) if os.path.exists(keys_path(store)) else 0,
+    }
+
+
+# cắt phần ghi dở về kích thước trong manifest; False → file bị ngắn đi
+# (sửa / xoá từ bên ngoài), không sửa được, phải rebuild
+def recover(store, manifest):
+
+    state = manifest.get(STATE_KEY)
+
+    # manifest cũ chưa có kích thước → tin như trước
+    if state is None:
+        return True
+
+    sizes = store_sizes(store)
+
+    for name, path in (("store", store), ("keys", keys_path(store))):
+
+        if sizes[name] < state[name]:
+            return False
+
+        if sizes[name] > state[name]:
+            print(f"🩹 {path}: bỏ {sizes[name] - state[name]} byte ghi dở từ lần chạy trước")
+
+            with open(path, "r+b") as f:
+                f.truncate(state[name])
+
+    return True
+
+
+def load_keys(store):
+
+    path = keys_path(store)
+
+    if not os.path.exists(path):
+        return set()
+
+    with open(path, "r", encoding="utf-8") as f:
+        return set(f.read().split())
+
+
+# ======================
+# CLEAN
+# ======================
+
+def row_keys(df, key_cols):
+
+    joined = df[key_cols].astype(str).agg("\x1f".join, axis=1)
+
+    return joined.map(lambda s: hashlib.sha1(s.encode("utf-8")).hexdigest())
+
+
+def clean_file(path, cfg):
+
+    df = pd.read_csv(path)
+
+    # bỏ dòng text rỗng / null
+    df = df.dropna(subset=["text"])
+    df = df[df["text"].astype(str).str.strip() != ""]
+
+    if cfg["keep_cols"]:
+        df = df[cfg["keep_cols"]]
+
+    if cfg["keep_cols"] and set(LABEL_COLS) <= set(cfg["keep_cols"]):
+        df = df[df[LABEL_COLS].isin([0, 1, 2, 3]).all(axis=1)]
+
+    if cfg["add_source"]:
+        df = df.assign(source_file=os.path.basename(path))
+
+    return df
+
+
+# ======================
+# CONSOLIDATE
+# ======================
+
+def rebuild(cfg, files):
+
+    store = cfg["store"]
+
+    for path in (store, keys_path(store), manifest_path(store)):
+        if os.path.exists(path):
+            os.remove(path)
+
+    return ingest(cfg, files, {}, set())
+
+
+def ingest(cfg, files, manifest, keys):
+
+    store = cfg["store"]
+
+    added = 0
+
+    for path in files:
+
+        try:
+            df = clean_file(path, cfg)
+        except Exception as e:
+            print(f"❌ Lỗi {path}: {e}")
+            continue
+
+        df = df.assign(_key=row_keys(df, cfg["key_cols"]))
+        df = df.drop_duplicates(subset=["_key"])
+        df = df[~df["_key"].isin(keys)]
+
+        df.drop(columns="_key").to_csv(
+            store,
+            mode="a",
+            header=not os.path.exists(store),
+            index=False
+        )
+
+        with open(keys_path(store), "a", encoding="utf-8") as f:
+            f.write("".join(k + "\n" for k in df["_key"]))
+
+        keys.update(df["_key"])
+
+        # chỉ khi manifest đã ghi thì dòng mới được tính là xong (xem recover)
+        manifest[path] = file_entry(path)
+        manifest[STATE_KEY] = store_sizes(store)
+        save_manifest(store, manifest)
+
+        added += len(df)
+
+        print(f"✅ {path}: +{len(df)} reviews mới")
+
+    return added
+
+
+def consolidate(target, full=False):
+
+    cfg = TARGETS[target]
+    store = cfg["store"]
+
+    files = sorted(glob.glob(cfg["pattern"]))
+    files = [f for f in files if os.path.abspath(f) != os.path.abspath(store)]
+
+    manifest = load_manifest(store)
+
+    if not full and os.path.exists(store) and not recover(store, manifest):
+        print(f"♻️ {store} ngắn hơn manifest → rebuild")
+        full = True
+
+    if full or not os.path.exists(store):
+        added = rebuild(cfg, files)
+        print(f"\n💾 {store}: rebuild, {added} reviews")
+        return
+
+    new_files, changed = [], []
+
+    for path in files:
+
+        old = manifest.get(path)
+        entry = file_entry(path, old)
+
+        if old is None:
+            new_files.append(path)
+        elif entry["sha1"] != old["sha1"]:
+            changed.append(path)
+
+    removed = [p for p in manifest if p != STATE_KEY and p not in files]
+
+    # file cũ bị sửa/xóa → dòng cũ đã lẫn trong store, phải build lại
+    if changed or removed:
+        print(f"♻️ {len(changed)} file đổi, {len(removed)} file mất → rebuild")
+        added = rebuild(cfg, files)
+        print(f"\n💾 {store}: rebuild, {added} reviews")
+        return
+
+    if not new_files:
+        print(f"✔️ {store}: không có file mới")
+        return
+
+    added = ingest(cfg, new_files, manifest, load_keys(store))
+
+    print(f"\n💾 {store}: +{added} reviews từ {len(new_files)} file mới")
+
+
+# ======================
+# CLI
+# ======================
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("target", choices=list(TARGETS) + ["all"])
+    parser.add_argument("--full", action="store_true")
+
+    args = parser.parse_args()
+
+    for target in (TARGETS if args.target == "all" else [args.target]):
+        consolidate(target, args.full)
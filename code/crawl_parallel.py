@@ -0,0 +1,232 @@
+import asyncio
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+from playwright.async_api import async_playwright
+
+import page_lifecycle
+import rate_limit
+import scraper
+import store
+
+
+# ======================
+# CONFIG
+# ======================
+
+WORKERS = min(4, os.cpu_count() or 1)
+
+# "state": export cookie + localStorage 1 lần, mỗi worker 1 context mới (nhẹ)
+# "copy":  copy cả chrome_profile cho mỗi worker (giữ IndexedDB, extension,...)
+MODE = "state"
+
+CLONE_ROOT = "profile_clones"
+STATE_FILE = os.path.join(CLONE_ROOT, "storage_state.json")
+
+# thời điểm hết nghỉ chung, mọi worker đọc trước mỗi request (xem rate_limit.py)
+BLOCK_FILE = os.path.join(CLONE_ROOT, "blocked_until.json")
+
+# cache / lock của chromium không cần cho session, bỏ qua khi copy
+CLONE_IGNORE = shutil.ignore_patterns(
+    "Cache", "Code Cache", "GPUCache", "DawnCache", "GrShaderCache",
+    "ShaderCache", "Service Worker", "Crashpad", "Singleton*", "lockfile",
+)
+
+
+# ======================
+# SESSION SNAPSHOT
+# ======================
+
+def clone_profile(src, dst):
+
+    if os.path.exists(dst):
+        shutil.rmtree(dst)
+
+    shutil.copytree(src, dst, ignore=CLONE_IGNORE)
+
+
+async def export_storage_state(profile_dir, path):
+
+    async with async_playwright() as p:
+
+        ctx = await p.chromium.launch_persistent_context(
+            user_data_dir=profile_dir,
+            headless=True,
+            locale="vi-VN",
+        )
+
+        await ctx.storage_state(path=path)
+
+        await ctx.close()
+
+
+def prepare_sessions(n_workers, mode, profile_dir=scraper.PROFILE_DIR):
+
+    os.makedirs(CLONE_ROOT, exist_ok=True)
+
+    if mode == "state":
+        asyncio.run(export_storage_state(profile_dir, STATE_FILE))
+        print(f"🍪 Export session → {STATE_FILE}")
+        return [STATE_FILE] * n_workers
+
+    sources = []
+
+    for i in range(n_workers):
+        dst = os.path.join(CLONE_ROOT, f"worker_{i}")
+        clone_profile(profile_dir, dst)
+        sources.append(dst)
+
+    print(f"📁 Copy {profile_dir} → {n_workers} profile trong {CLONE_ROOT}")
+
+    return sources
+
+
+def cleanup_sessions():
+    shutil.rmtree(CLONE_ROOT, ignore_errors=True)
+
+
+# ======================
+# WORKER
+# ======================
+
+def done_path(worker_no):
+    return os.path.join(scraper.OUTPUT_DIR, f"crawl_worker_{worker_no}.done")
+
+
+async def crawl_worker(worker_no, urls, mode, source, n_workers, headless, capture_raw):
+
+    # process con (spawn trên Windows) không thấy biến đã đổi ở process cha
+    scraper.CAPTURE_RAW = capture_raw
+
+    # mỗi process 1 limiter riêng, chia rate cho số worker để tổng không đổi;
+    # trạng thái bị chặn dùng chung qua BLOCK_FILE
+    rate_limit.share_limiter(rate_limit.LIMITER, n_workers, BLOCK_FILE)
+
+    base, ext = os.path.splitext(scraper.OUTPUT_FILE)
+    scraper.OUTPUT_FILE = f"{base}_w{worker_no}{ext}"
+
+    conn = store.connect() if scraper.USE_STORE else None
+
+    def on_done(url):
+        with open(done_path(worker_no), "a", encoding="utf-8") as f:
+            f.write(url + "\n")
+
+    async with async_playwright() as p:
+
+        browser = None
+
+        if mode == "copy":
+            async def launch():
+                return await p.chromium.launch_persistent_context(
+                    user_data_dir=source,
+                    headless=headless,
+                    locale="vi-VN",
+                    args=scraper.LAUNCH_ARGS,
+                )
+        else:
+            browser = await p.chromium.launch(headless=headless, args=scraper.LAUNCH_ARGS)
+
+            async def launch():
+                return await browser.new_context(storage_state=source, locale="vi-VN")
+
+        lc = page_lifecycle.new_lifecycle(await launch(), relaunch=launch)
+
+        await scraper.crawl(lc, urls, conn, on_done)
+
+        await page_lifecycle.close(lc)
+
+        if browser is not None:
+            await browser.close()
+
+
+def worker_main(args):
+    asyncio.run(crawl_worker(*args))
+
+
+# ======================
+# MAIN
+# ======================
+
+def load_done(n_workers):
+
+    done = set()
+
+    for i in range(n_workers):
+        path = done_path(i)
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                done.update(line.strip() for line in f if line.strip())
+
+            os.remove(path)
+
+    return done
+
+
+# URL xong dồn lên đầu phần chưa scrape → dòng đầu urls.txt vẫn đúng nghĩa
+def update_urls_file(n_done, urls, done):
+
+    rest = urls[n_done:]
+
+    lines = (
+        urls[:n_done]
+        + [u for u in rest if u in done]
+        + [u for u in rest if u not in done]
+    )
+
+    with open(scraper.URLS_FILE, "w", encoding="utf-8") as f:
+        f.write("\n".join([str(n_done + sum(u in done for u in rest))] + lines))
+
+
+def run_parallel(n_workers=WORKERS, mode=MODE, headless=True, capture_raw=scraper.CAPTURE_RAW):
+
+    n_done, urls = scraper.load_urls()
+
+    todo = [u for u in urls[n_done:] if u.strip()]
+
+    if not todo:
+        print("✔️ Không còn URL chưa scrape")
+        return
+
+    n_workers = min(n_workers, len(todo))
+
+    print(f"🚀 {len(todo)} URL, {n_workers} process, mode={mode}")
+
+    try:
+        sources = prepare_sessions(n_workers, mode)
+
+        tasks = [
+            (i, todo[i::n_workers], mode, sources[i], n_workers, headless, capture_raw)
+            for i in range(n_workers)
+        ]
+
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            for _ in pool.map(worker_main, tasks):
+                pass
+
+    finally:
+        done = load_done(n_workers)
+        update_urls_file(n_done, urls, done)
+        cleanup_sessions()
+
+        print(f"\n✅ {len(done)}/{len(todo)} URL xong, đã xoá {CLONE_ROOT}")
+
+
+# ======================
+# CLI
+# ======================
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--mode", choices=["state", "copy"], default=MODE)
+    parser.add_argument("--headed", action="store_true")
+    parser.add_argument("--capture-raw", action="store_true")
+
+    args = parser.parse_args()
+
+    run_parallel(args.workers, args.mode, headless=not args.headed, capture_raw=args.capture_raw)
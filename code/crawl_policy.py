@@ -0,0 +1,220 @@
+import json
+import os
+import re
+
+
+# ======================
+# CONFIG
+# ======================
+
+# mặc định giữ hành vi cũ: lấy review 1-4 sao, dừng khi sang 5 sao
+DEFAULT_POLICY = {
+    # [min, max] sao được giữ (tính cả 2 đầu)
+    "window": [1, 4],
+    # {sao: số review} mỗi sao / place, sao không ghi thì bỏ; None = không giới hạn
+    "quota": None,
+    # tổng review tối đa / place; 0 = không giới hạn
+    "max_reviews": 0,
+    # khi sort theo sao, Maps xếp review không có chữ xuống cuối → gặp review rỗng là hết
+    "stop_on_empty": True,
+}
+
+# JSON {"default": {...}, "places": {url hoặc place_name: {...}}}
+# mỗi place chỉ cần ghi key khác default, vd {"window": [1, 3], "quota": {"1": 50}}
+POLICY_FILE = "crawl_policy.json"
+
+# review ngắn hơn → review_row bỏ, không tính vào quota
+MIN_TEXT_LEN = 5
+
+# "5 sao", "4,0 sao", "Xếp hạng 4 trên 5 sao", "Rated 4.0 out of 5 stars"
+RATING_NUMBER_RE = re.compile(r"(\d+(?:[.,]\d+)?)")
+
+# scraper.force_vietnamese thêm "?hl=vi" / "&hl=vi" vào cuối URL
+FORCED_HL_RE = re.compile(r"[?&]hl=vi$")
+
+KEEP, SKIP, STOP = "keep", "skip", "stop"
+
+
+# ======================
+# POLICY
+# ======================
+
+def new_policy(window=None, quota=None, max_reviews=None, stop_on_empty=None):
+
+    policy = dict(DEFAULT_POLICY)
+
+    for key, value in [("window", window), ("quota", quota),
+                       ("max_reviews", max_reviews), ("stop_on_empty", stop_on_empty)]:
+        if value is not None:
+            policy[key] = value
+
+    return normalize(policy)
+
+
+# key JSON luôn là string → quota {"1": 50} thành {1: 50}
+def normalize(policy):
+
+    lo, hi = policy["window"]
+
+    policy["window"] = [int(lo), int(hi)]
+
+    if policy["quota"]:
+        policy["quota"] = {
+            int(star): int(n) for star, n in policy["quota"].items()
+            if lo <= int(star) <= hi
+        }
+    else:
+        policy["quota"] = None
+
+    return policy
+
+
+POLICIES = {"default": new_policy(), "places": {}}
+
+
+def load_policies(path=POLICY_FILE):
+
+    if not os.path.exists(path):
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    default = {**DEFAULT_POLICY, **data.get("default", {})}
+
+    POLICIES["default"] = normalize(dict(default))
+    POLICIES["places"] = {
+        key: normalize({**default, **override})
+        for key, override in data.get("places", {}).items()
+    }
+
+    print(f"🎯 Crawl policy từ {path}: {len(POLICIES['places'])} place riêng")
+
+
+load_policies()
+
+
+# url có thể đã qua force_vietnamese → thử cả bản gốc như trong urls.txt
+def policy_for(url, place_name=None):
+
+    places = POLICIES["places"]
+
+    for key in (url, FORCED_HL_RE.sub("", url or ""), place_name):
+        if key in places:
+            return places[key]
+
+    return POLICIES["default"]
+
+
+# ======================
+# RATING
+# ======================
+
+# số đầu tiên trong aria-label; "4,5" / "4.5" → 4.5. None nếu không có số
+def parse_rating(text):
+
+    if not text:
+        return None
+
+    m = RATING_NUMBER_RE.search(text)
+
+    if not m:
+        return None
+
+    return float(m.group(1).replace(",", "."))
+
+
+# ======================
+# SORT
+# ======================
+
+# có quota thì chỉ các sao trong quota được lấy → cửa sổ thu lại
+def effective_window(policy):
+
+    if policy["quota"]:
+        return min(policy["quota"]), max(policy["quota"])
+
+    return tuple(policy["window"])
+
+
+# review được sort theo sao → cửa sổ chạm 1 sao: thấp nhất trước,
+# chạm 5 sao: cao nhất trước; cả 2 (hoặc không chạm bên nào) → bên gần hơn.
+# [1, 5] lấy hết → giữ thứ tự mặc định của Maps, khỏi sort
+def choose_sort(policy):
+
+    lo, hi = effective_window(policy)
+
+    if lo <= 1 and hi >= 5:
+        return None
+
+    if lo <= 1:
+        return "lowest"
+
+    if hi >= 5:
+        return "highest"
+
+    return "lowest" if (lo + hi) / 2 <= 3 else "highest"
+
+
+# ======================
+# TALLY
+# ======================
+
+def new_tally():
+    return {"stars": {}, "total": 0}
+
+
+def quota_met(policy, tally):
+
+    if policy["max_reviews"] and tally["total"] >= policy["max_reviews"]:
+        return True
+
+    quota = policy["quota"]
+
+    return bool(quota) and all(tally["stars"].get(s, 0) >= n for s, n in quota.items())
+
+
+# quyết định 1 review theo thứ tự load: KEEP (lưu), SKIP (bỏ qua, đọc tiếp),
+# STOP (mọi review sau cũng bị bỏ → dừng scroll)
+def classify(policy, tally, sort, stars, text):
+
+    if len(text.strip()) < MIN_TEXT_LEN:
+        # thứ tự mặc định thì review rỗng nằm lẫn → chỉ bỏ qua
+        return STOP if policy["stop_on_empty"] and sort is not None else SKIP
+
+    if stars is None:
+        return SKIP
+
+    lo, hi = effective_window(policy)
+
+    if stars > hi:
+        return STOP if sort == "lowest" else SKIP
+
+    if stars < lo:
+        return STOP if sort == "highest" else SKIP
+
+    star = int(stars)
+    quota = policy["quota"]
+
+    if quota is not None and tally["stars"].get(star, 0) >= quota.get(star, 0):
+        return SKIP
+
+    tally["stars"][star] = tally["stars"].get(star, 0) + 1
+    tally["total"] += 1
+
+    return KEEP
+
+
+def describe(policy):
+
+    lo, hi = policy["window"]
+
+    parts = [f"{lo}-{hi} sao"]
+
+    if policy["quota"]:
+        parts.append("quota " + ", ".join(f"{s}★={n}" for s, n in sorted(policy["quota"].items())))
+
+    if policy["max_reviews"]:
+        parts.append(f"tối đa {policy['max_reviews']}")
+
+    return ", ".join(parts)
@@ -2,18 +2,21 @@ import asyncio
 import json
 import os
 import re
-import time
 from datetime import datetime
 
 import pandas as pd
 from playwright.async_api import async_playwright
 
+import aug_quality
+import chat_reply
+import store
+
 
 # ======================
 # CONFIG
 # ======================
 
-INPUT_CSV = "low_frequency_classes.csv"
+INPUT_CSV = "low_frequency_classes.csv"  # tạo bằng low_freq.py
 OUTPUT_DIR = "augmented_output"
 
 CHATGPT_URL = "https://chat.openai.com/"
@@ -21,10 +24,15 @@ CHATGPT_URL = "https://chat.openai.com/"
 BATCH_SIZE = 2
 AUG_PER_SAMPLE = 10
 
-RELOAD_EVERY = 5
+# bỏ rewrite gần trùng câu gốc / trùng nhau trước khi lưu
+FILTER_NEAR_DUPLICATES = True
 
-POST_GENERATION_DELAY = 2
-WAIT_ICON = 'svg use[href*="#bbf3a9"]'
+# ghi thêm augmentation vào SQLite store (xem store.py); CSV vẫn là output chính,
+# bật bằng --store
+USE_STORE = False
+STORE_CONN = None
+
+RELOAD_EVERY = 5
 
 INPUT_SELECTORS = [
     "div[contenteditable='true']",
@@ -32,94 +40,110 @@ INPUT_SELECTORS = [
     "div[role='textbox']",
 ]
 
-REPLY_SELECTORS = [
-    "div.markdown",
-    "div.prose",
-    "article",
-]
-
 PROGRESS_FILE = "augmentation_progress.json"
+JOURNAL_FILE = "augmentation_progress.log"
+
+COMPACT_JOURNAL_BYTES = 64 * 1024
 
 
 # ======================
 # PROGRESS TRACKING
 # ======================
 
+# snapshot (compact) + journal append-only, mỗi dòng 1 index đã xong
 def load_progress():
 
-    if not os.path.exists(PROGRESS_FILE):
-        return set()
+    done = set()
 
-    with open(PROGRESS_FILE, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    if os.path.exists(PROGRESS_FILE):
+        with open(PROGRESS_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
 
-    return set(data.get("done_indexes", []))
+        done.update(data.get("done_indexes", []))
 
+    if os.path.exists(JOURNAL_FILE):
+        with open(JOURNAL_FILE, "rb") as f:
+            raw = f.read()
 
-def save_progress(done_indexes):
+        # dòng cuối có thể bị ghi dở khi crash → cắt bỏ
+        # để lần append sau không dính vào nó
+        valid = raw[:raw.rfind(b"\n") + 1]
 
-    with open(PROGRESS_FILE, "w", encoding="utf-8") as f:
-        json.dump(
-            {"done_indexes": list(done_indexes)},
-            f,
-            ensure_ascii=False,
-            indent=2
-        )
+        if len(valid) != len(raw):
+            with open(JOURNAL_FILE, "r+b") as f:
+                f.truncate(len(valid))
 
+        for line in valid.decode("utf-8").splitlines():
+            try:
+                done.add(int(line))
+            except ValueError:
+                pass
 
-# ======================
-# CHATGPT HELPERS
-# ======================
+    return done
 
-async def find_input_box(page):
 
-    for sel in INPUT_SELECTORS:
-        try:
-            await page.wait_for_selector(sel, timeout=5000)
-            box = page.locator(sel).first
+def append_progress(indexes):
 
-            if await box.is_visible():
-                return box
-        except:
-            pass
+    with open(JOURNAL_FILE, "a", encoding="utf-8") as f:
+        f.write("".join(f"{i}\n" for i in indexes))
+        f.flush()
+        os.fsync(f.fileno())
 
-    raise RuntimeError("ChatGPT input box not found")
 
+def compact_progress(done_indexes):
 
-async def wait_for_generation(page, timeout=120):
+    tmp = PROGRESS_FILE + ".tmp"
 
-    start = time.time()
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"done_indexes": sorted(done_indexes)}, f)
+        f.flush()
+        os.fsync(f.fileno())
 
-    while True:
+    # snapshot đã chứa mọi index trong journal → thay thế atomic rồi xóa journal
+    os.replace(tmp, PROGRESS_FILE)
 
-        generating = await page.locator(WAIT_ICON).count() > 0
+    if os.path.exists(JOURNAL_FILE):
+        os.remove(JOURNAL_FILE)
 
-        if not generating:
-            await asyncio.sleep(POST_GENERATION_DELAY)
-            return
 
-        if time.time() - start > timeout:
-            raise TimeoutError("Generation timeout")
+def save_progress(done_indexes, new_indexes):
 
-        await asyncio.sleep(0.5)
+    append_progress(new_indexes)
 
+    if not os.path.exists(JOURNAL_FILE):
+        return
 
-async def get_last_reply(page):
+    if os.path.getsize(JOURNAL_FILE) > COMPACT_JOURNAL_BYTES:
+        compact_progress(done_indexes)
 
-    for sel in REPLY_SELECTORS:
 
-        nodes = page.locator(sel)
-        count = await nodes.count()
+# vị trí (theo batch) của index đầu tiên chưa xong
+def first_unfinished(index, done_indexes):
 
-        if count > 0:
-            last = nodes.nth(count - 1)
-            text = await last.inner_text()
+    for pos, i in enumerate(index):
+        if i not in done_indexes:
+            return pos - pos % BATCH_SIZE
 
-            if text.strip():
-                return text.strip()
+    return len(index)
 
-    raise RuntimeError("Reply not captured")
 
+# ======================
+# CHATGPT HELPERS
+# ======================
+
+async def find_input_box(page):
+
+    for sel in INPUT_SELECTORS:
+        try:
+            await page.wait_for_selector(sel, timeout=5000)
+            box = page.locator(sel).first
+
+            if await box.is_visible():
+                return box
+        except:
+            pass
+
+    raise RuntimeError("ChatGPT input box not found")
 
 
 # ======================
@@ -198,6 +222,8 @@ async def generate_batch(page, texts):
 
     prompt = build_augmentation_prompt(texts)
 
+    await chat_reply.mark_replies_seen(page)
+
     await input_box.click()
 
     try:
@@ -207,9 +233,7 @@ async def generate_batch(page, texts):
 
     await page.keyboard.press("Enter")
 
-    await wait_for_generation(page)
-
-    reply = await get_last_reply(page)
+    reply = await chat_reply.wait_for_reply(page)
 
     data = extract_json(reply)
 
@@ -223,6 +247,15 @@ async def generate_batch(page, texts):
 # SAVE RESULTS
 # ======================
 
+def get_store():
+    global STORE_CONN
+
+    if STORE_CONN is None:
+        STORE_CONN = store.connect()
+
+    return STORE_CONN
+
+
 def append_to_csv(original_rows, aug_results, output_file):
 
     rows = []
@@ -238,11 +271,20 @@ def append_to_csv(original_rows, aug_results, output_file):
                 "food": row.get("food"),
                 "service": row.get("service"),
                 "place": row.get("place"),
-                "cost": row.get("cost"),
+                # file cũ dùng "cost", chuẩn hoá về "price"
+                "price": row.get("price", row.get("cost")),
             })
 
     df = pd.DataFrame(rows)
 
+    if FILTER_NEAR_DUPLICATES:
+        before = len(df)
+        df = aug_quality.filter_augmented(df)
+        print(f"Near-duplicate filter: {len(df)}/{before} kept, {int(df['drift'].sum())} drift")
+
+    if USE_STORE and not df.empty:
+        store.add_augmentations(get_store(), df.to_dict("records"), method="llm")
+
     file_exists = os.path.isfile(output_file)
 
     df.to_csv(
@@ -291,7 +333,11 @@ async def run():
 
         batch_count = 0
 
-        for start in range(0, total, BATCH_SIZE):
+        resume_at = first_unfinished(df.index, done_indexes)
+
+        print(f"Resume from position {resume_at}/{total}")
+
+        for start in range(resume_at, total, BATCH_SIZE):
 
             batch_df = df.iloc[start:start+BATCH_SIZE]
 
@@ -315,10 +361,9 @@ async def run():
 
                 print("Saved batch")
 
-                for i in batch_indexes:
-                    done_indexes.add(i)
+                done_indexes.update(batch_indexes)
 
-                save_progress(done_indexes)
+                save_progress(done_indexes, batch_indexes)
 
                 batch_count += 1
 
@@ -335,6 +380,8 @@ async def run():
 
         await browser.close()
 
+    compact_progress(done_indexes)
+
     print("Finished")
     print("Output:", output_file)
 
@@ -344,4 +391,15 @@ async def run():
 # ======================
 
 if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--store", action="store_true")
+
+    args = parser.parse_args()
+
+    if args.store:
+        USE_STORE = True
+
     asyncio.run(run())
\ No newline at end of file
@@ -1,6 +1,14 @@
-import pandas as pd
-import random
+import os
 import re
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import features
+import store
 
 # ======================
 # CONFIG
@@ -9,11 +17,22 @@ import re
 INPUT_FILE = "reviews_labeled.csv"
 OUTPUT_FILE = "reviews_augmented.csv"
 
-LABEL_COLS = ["food", "service", "place", "cost"]
+LABEL_COLS = store.LABEL_COLS
 
 TARGET_PER_CLASS = 120
 AUG_PROB = 0.35
 
+SEED = 42
+
+# chế độ song song: mỗi task sinh tối đa CHUNK_ROWS dòng rồi ghi ra đĩa
+WORKERS = os.cpu_count() or 1
+CHUNK_ROWS = 20000
+
+# ghi thêm augmentation vào SQLite store; mỗi process mở connection riêng.
+# bật bằng --store, hoặc --from-store (đọc v_labeled thì ghi lại vào store)
+USE_STORE = False
+STORE_CONN = None
+
 
 # ======================
 # SYNONYM DICTIONARY
@@ -32,104 +51,199 @@ SYNONYMS = {
 }
 
 
+# ======================
+# PHRASE MATCHER
+# ======================
+
+# gom key thành trie để regex không phải thử lại từng key ở mỗi vị trí
+def trie_pattern(words):
+
+    trie = {}
+
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+
+        # "" = kết thúc 1 key
+        optional = "" in node
+        branches = [
+            (r"\s+" if ch == " " else re.escape(ch)) + build(child)
+            for ch, child in sorted(node.items())
+            if ch
+        ]
+
+        if not branches:
+            return ""
+
+        if len(branches) == 1 and not optional:
+            return branches[0]
+
+        body = "(?:" + "|".join(branches) + ")"
+
+        return body + "?" if optional else body
+
+    return build(trie)
+
+
+def compile_synonyms(synonyms):
+
+    keys = [" ".join(k.lower().split()) for k in synonyms if k.strip()]
+
+    # ranh giới từ theo \w (unicode) → không cắt giữa chữ có dấu,
+    # regex tham lam trên trie → khớp cụm dài nhất ("nhân viên" trước "nhân")
+    return re.compile(
+        rf"(?<!\w){trie_pattern(keys)}(?!\w)",
+        re.IGNORECASE
+    )
+
+
+SYNONYM_RE = compile_synonyms(SYNONYMS)
+
+SYNONYM_LOOKUP = {" ".join(k.lower().split()): v for k, v in SYNONYMS.items()}
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
 # ======================
 # TEXT PARAPHRASE
 # ======================
 
-def synonym_replace(text):
+# mọi bước ngẫu nhiên đều lấy từ rng → cùng SEED cho cùng kết quả
 
-    words = text.split()
+def synonym_replacer(rng):
 
-    new_words = []
+    def replace(match):
 
-    for w in words:
+        if rng.random() >= AUG_PROB:
+            return match.group(0)
+
+        key = " ".join(match.group(0).lower().split())
+        options = SYNONYM_LOOKUP[key]
+
+        return options[rng.integers(len(options))]
 
-        key = w.lower()
+    return replace
 
-        if key in SYNONYMS and random.random() < AUG_PROB:
 
-            new_words.append(random.choice(SYNONYMS[key]))
+def synonym_replace(text, rng):
+    return SYNONYM_RE.sub(synonym_replacer(rng), text)
 
-        else:
-            new_words.append(w)
 
-    return " ".join(new_words)
+# regex biên dịch sẵn + hàm thay thế dùng chung rng, chạy qua str.replace
+# (lookbehind không có trong RE2 → pandas tự dùng re của Python cho pattern này)
+def synonym_replace_series(texts, rng):
+    return texts.astype(str).str.replace(SYNONYM_RE, synonym_replacer(rng), regex=True)
 
 
-def random_word_drop(text):
+def random_word_drop(text, rng):
 
     words = text.split()
 
     if len(words) < 6:
         return text
 
-    new_words = []
-
-    for w in words:
-
-        if random.random() < 0.08:
-            continue
-
-        new_words.append(w)
+    keep = rng.random(len(words)) >= 0.08
 
-    return " ".join(new_words)
+    return " ".join(w for w, k in zip(words, keep) if k)
 
 
-def random_swap(text):
+def random_swap(text, rng):
 
     words = text.split()
 
     if len(words) < 6:
         return text
 
-    i = random.randint(0, len(words)-2)
+    i = rng.integers(0, len(words) - 1)
 
     words[i], words[i+1] = words[i+1], words[i]
 
     return " ".join(words)
 
 
-def paraphrase_text(text):
+def paraphrase_text(text, rng):
+
+    return paraphrase_series(pd.Series([text]), rng).iloc[0]
+
+
+def paraphrase_series(texts, rng):
+
+    texts = synonym_replace_series(texts, rng)
 
-    text = synonym_replace(text)
+    # bốc thăm drop / swap cho cả batch 1 lần
+    do_drop = rng.random(len(texts)) < 0.4
+    do_swap = rng.random(len(texts)) < 0.3
 
-    if random.random() < 0.4:
-        text = random_word_drop(text)
+    out = []
 
-    if random.random() < 0.3:
-        text = random_swap(text)
+    for text, drop, swap in zip(texts, do_drop, do_swap):
 
-    text = re.sub(r"\s+", " ", text).strip()
+        if drop:
+            text = random_word_drop(text, rng)
 
-    return text
+        if swap:
+            text = random_swap(text, rng)
+
+        out.append(text)
+
+    return (
+        pd.Series(out, index=texts.index)
+        .str.replace(WHITESPACE_RE, " ", regex=True)
+        .str.strip()
+    )
 
 
 # ======================
 # AUGMENTATION
 # ======================
 
-def augment_group(group, needed):
+def augment_group(group, needed, rng):
+
+    # lấy toàn bộ index nguồn 1 lần, gom hàng bằng 1 lần take
+    idx = rng.integers(0, len(group), needed)
+
+    rows = group.take(idx).copy()
+
+    original = rows["text"].astype(str)
+
+    rows["text"] = paraphrase_series(rows["text"], rng)
 
-    rows = []
+    if USE_STORE:
+        records = rows[LABEL_COLS].assign(original=original, augmented=rows["text"])
+        store.add_augmentations(get_store(), records.to_dict("records"), method="syn")
 
-    for i in range(needed):
+    return rows
 
-        sample = group.sample(1).iloc[0]
 
-        new_row = sample.copy()
+def get_store():
+    global STORE_CONN
 
-        new_row["text"] = paraphrase_text(sample["text"])
+    if STORE_CONN is None:
+        STORE_CONN = store.connect()
 
-        rows.append(new_row)
+    return STORE_CONN
 
-    return pd.DataFrame(rows)
+
+# file cũ dùng "cost" → đổi về "price"
+def load_input(path, from_store=False):
+
+    if from_store:
+        return store.read_view(get_store(), "v_labeled")
+
+    return store.normalize_columns(pd.read_csv(path))
 
 
 # ======================
 # MAIN AUGMENTATION
 # ======================
 
-def augment_dataset(df):
+def augment_dataset(df, seed=SEED):
+
+    rng = np.random.default_rng(seed)
 
     groups = df.groupby(LABEL_COLS)
 
@@ -150,7 +264,7 @@ def augment_dataset(df):
 
         print("augment:", needed)
 
-        aug = augment_group(group, needed)
+        aug = augment_group(group, needed, rng)
 
         augmented_data.append(aug)
 
@@ -163,13 +277,119 @@ def augment_dataset(df):
     return df
 
 
+# ======================
+# PARALLEL AUGMENTATION
+# ======================
+
+# chia nhu cầu của từng nhóm label thành task <= chunk_rows dòng.
+# seed của task chỉ phụ thuộc (seed, nhóm, chunk) → kết quả không đổi theo số worker
+def plan_tasks(df, target, chunk_rows, seed):
+
+    tasks = []
+
+    for group_no, (label, group) in enumerate(df.groupby(LABEL_COLS)):
+
+        needed = target - len(group)
+
+        if needed <= 0:
+            continue
+
+        for chunk_no, start in enumerate(range(0, needed, chunk_rows)):
+            tasks.append((
+                label,
+                group,
+                min(chunk_rows, needed - start),
+                np.random.SeedSequence([seed, group_no, chunk_no]),
+            ))
+
+    return tasks
+
+
+def run_task(task_no, group, needed, seed_seq, part_dir, use_store):
+
+    global USE_STORE, STORE_CONN
+
+    # worker không dùng chung connection SQLite kế thừa từ process cha
+    USE_STORE = use_store
+    STORE_CONN = None
+
+    rng = np.random.default_rng(seed_seq)
+
+    aug = update_word_count(augment_group(group, needed, rng))
+
+    part = os.path.join(part_dir, f"part-{task_no:06d}.csv")
+    aug.to_csv(part, index=False)
+
+    return part, len(aug)
+
+
+# ghép các part theo thứ tự task, chỉ copy stream, không load vào RAM
+def concat_parts(parts, out_path):
+
+    with open(out_path, "w", encoding="utf-8", newline="") as out:
+
+        for i, part in enumerate(parts):
+
+            with open(part, "r", encoding="utf-8", newline="") as f:
+
+                header = f.readline()
+
+                if i == 0:
+                    out.write(header)
+
+                shutil.copyfileobj(f, out)
+
+
+def augment_parallel(df, out_path, target=TARGET_PER_CLASS, workers=WORKERS,
+                     chunk_rows=CHUNK_ROWS, seed=SEED):
+
+    tasks = plan_tasks(df, target, chunk_rows, seed)
+
+    total_needed = sum(t[2] for t in tasks)
+
+    print(f"Tasks: {len(tasks)}, rows to generate: {total_needed}, workers: {workers}")
+
+    part_dir = tempfile.mkdtemp(prefix="aug_parts_", dir=os.path.dirname(os.path.abspath(out_path)))
+
+    try:
+        # part-000000 = dữ liệu gốc
+        base = os.path.join(part_dir, "part-000000.csv")
+        update_word_count(df.copy()).to_csv(base, index=False)
+
+        parts = {0: base}
+        done = 0
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+
+            futures = {
+                pool.submit(run_task, i, group, needed, seed_seq, part_dir, USE_STORE): i
+                for i, (label, group, needed, seed_seq) in enumerate(tasks, start=1)
+            }
+
+            for fut in as_completed(futures):
+
+                part, n = fut.result()
+
+                parts[futures[fut]] = part
+                done += n
+
+                print(f"✅ {done}/{total_needed}")
+
+        concat_parts([parts[i] for i in sorted(parts)], out_path)
+
+    finally:
+        shutil.rmtree(part_dir, ignore_errors=True)
+
+    print("Saved:", out_path)
+
+
 # ======================
 # WORD COUNT UPDATE
 # ======================
 
 def update_word_count(df):
 
-    df["word_count"] = df["text"].apply(lambda x: len(str(x).split()))
+    df["word_count"] = features.word_count(df["text"])
 
     return df
 
@@ -178,13 +398,13 @@ def update_word_count(df):
 # MAIN
 # ======================
 
-def main():
+def main(from_store=False):
 
-    df = pd.read_csv(INPUT_FILE)
+    df = load_input(INPUT_FILE, from_store)
 
     print("Original dataset:", len(df))
 
-    df = augment_dataset(df)
+    df = augment_dataset(df, SEED)
 
     df = update_word_count(df)
 
@@ -201,4 +421,27 @@ def main():
 
 if __name__ == "__main__":
 
-    main()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", "-i", default=INPUT_FILE)
+    parser.add_argument("--output", "-o", default=OUTPUT_FILE)
+    parser.add_argument("--parallel", action="store_true")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--target", type=int, default=TARGET_PER_CLASS)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--from-store", action="store_true")
+    parser.add_argument("--store", action="store_true")
+
+    args = parser.parse_args()
+
+    USE_STORE = args.store or args.from_store
+
+    if args.parallel:
+        df = load_input(args.input, args.from_store)
+        print("Original dataset:", len(df))
+        augment_parallel(df, args.output, args.target, args.workers, seed=args.seed)
+    else:
+        INPUT_FILE, OUTPUT_FILE, TARGET_PER_CLASS = args.input, args.output, args.target
+        SEED = args.seed
+        main(args.from_store)
\ No newline at end of file
@@ -0,0 +1,386 @@
+import hashlib
+import os
+import re
+import sqlite3
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+import aug_quality
+
+
+# ======================
+# CONFIG
+# ======================
+
+DB_FILE = "output_labeled/dedup.db"
+
+# 64 hoán vị = BANDS x ROWS; ngưỡng LSH ~ (1/BANDS)^(1/ROWS) ≈ 0.77
+BANDS = 8
+ROWS = 8
+
+DUP_THRESHOLD = 0.8
+
+CHUNK_SIZE = 20000
+
+assert BANDS * ROWS == aug_quality.NUM_PERM
+
+
+# ======================
+# VIETNAMESE NORMALIZATION
+# ======================
+
+# dấu thanh kiểu cũ / mới: "hoà" vs "hòa", "thuỷ" vs "thủy" → đưa về kiểu mới
+TONE_FIXES = {
+    "òa": "oà", "óa": "oá", "ỏa": "oả", "õa": "oã", "ọa": "oạ",
+    "òe": "oè", "óe": "oé", "ỏe": "oẻ", "õe": "oẽ", "ọe": "oẹ",
+    "ùy": "uỳ", "úy": "uý", "ủy": "uỷ", "ũy": "uỹ", "ụy": "uỵ",
+}
+
+# chỉ sửa khi là cuối âm tiết (không có phụ âm cuối phía sau)
+TONE_RE = re.compile(
+    "(" + "|".join(TONE_FIXES) + r")(?!\w)"
+)
+
+SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_vi(text):
+
+    text = unicodedata.normalize("NFC", str(text)).lower()
+    text = TONE_RE.sub(lambda m: TONE_FIXES[m.group(1)], text)
+
+    return SPACE_RE.sub(" ", text).strip()
+
+
+def text_hash(norm_text):
+    return hashlib.sha1(norm_text.encode("utf-8")).hexdigest()
+
+
+# ======================
+# INDEX (SQLite)
+# ======================
+
+def connect(db_path=DB_FILE):
+
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS docs (
+            id INTEGER PRIMARY KEY,
+            text TEXT,
+            text_hash TEXT UNIQUE,
+            source TEXT,
+            copies INTEGER DEFAULT 1,
+            cluster INTEGER,
+            sig BLOB
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_docs_cluster ON docs(cluster);
+
+        CREATE TABLE IF NOT EXISTS bands (
+            band INTEGER,
+            bucket INTEGER,
+            doc_id INTEGER
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_bands ON bands(band, bucket);
+
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            sha1 TEXT,
+            size INTEGER,
+            rows INTEGER
+        );
+    """)
+
+    # DB cũ chưa có size / rows → lần index sau đọc lại cả file như trước
+    have = {row[1] for row in conn.execute("PRAGMA table_info(files)")}
+
+    with conn:
+        for col in ("size", "rows"):
+            if col not in have:
+                conn.execute(f"ALTER TABLE files ADD COLUMN {col} INTEGER")
+
+    return conn
+
+
+def band_buckets(sigs):
+    # mỗi band ROWS giá trị uint32 → 1 int64 hash
+    bands = sigs.reshape(len(sigs), BANDS, ROWS)
+    raw = np.ascontiguousarray(bands).view(np.uint8).reshape(len(sigs), BANDS, -1)
+
+    return np.array([
+        [int.from_bytes(hashlib.blake2b(b.tobytes(), digest_size=8).digest(), "little", signed=True)
+         for b in row]
+        for row in raw
+    ], dtype=np.int64)
+
+
+# thêm text mới vào index; doc mới vào cluster của leader giống nhất,
+# không có leader nào đủ gần → tự làm leader. So với leader thay vì
+# mọi thành viên để tránh "xích" A≈B≈C gộp các câu ngắn khác hẳn nhau
+def add_texts(conn, texts, source, threshold=DUP_THRESHOLD):
+
+    norm = [normalize_vi(t) for t in texts]
+    hashes = [text_hash(t) for t in norm]
+
+    # trùng chính xác (sau chuẩn hoá) → chỉ tăng copies, không index lại
+    copies = {}
+    fresh = []
+
+    for i, h in enumerate(hashes):
+        if h not in copies:
+            fresh.append(i)
+        copies[h] = copies.get(h, 0) + 1
+
+    existing = set()
+    unique = [hashes[i] for i in fresh]
+
+    for start in range(0, len(unique), 500):
+        part = unique[start:start + 500]
+        existing.update(
+            row[0] for row in conn.execute(
+                f"SELECT text_hash FROM docs WHERE text_hash IN ({','.join('?' * len(part))})",
+                part
+            )
+        )
+
+    with conn:
+        conn.executemany(
+            "UPDATE docs SET copies = copies + ? WHERE text_hash = ?",
+            [(copies[h], h) for h in existing]
+        )
+
+    fresh = [i for i in fresh if hashes[i] not in existing]
+
+    if not fresh:
+        return 0
+
+    sigs = aug_quality.signatures([norm[i] for i in fresh])
+    buckets = band_buckets(sigs)
+
+    added = 0
+
+    with conn:
+
+        for j, i in enumerate(fresh):
+
+            sig = sigs[j]
+
+            cur = conn.execute(
+                "INSERT INTO docs (text, text_hash, source, copies, sig) VALUES (?, ?, ?, ?, ?)",
+                (str(texts[i]), hashes[i], source, copies[hashes[i]], sig.tobytes())
+            )
+            doc_id = cur.lastrowid
+
+            # ứng viên = leader chung ít nhất 1 band
+            candidates = set()
+
+            for band, bucket in enumerate(buckets[j]):
+                candidates.update(
+                    r[0] for r in conn.execute(
+                        "SELECT doc_id FROM bands WHERE band = ? AND bucket = ?",
+                        (band, int(bucket))
+                    )
+                )
+
+            cluster, best = doc_id, threshold
+
+            for cand_id in candidates:
+
+                cand_sig = conn.execute(
+                    "SELECT sig FROM docs WHERE id = ?", (cand_id,)
+                ).fetchone()[0]
+
+                sim = (np.frombuffer(cand_sig, dtype=np.uint32) == sig).mean()
+
+                if sim >= best:
+                    cluster, best = cand_id, sim
+
+            conn.execute("UPDATE docs SET cluster = ? WHERE id = ?", (cluster, doc_id))
+
+            # chỉ leader mới vào bảng bands
+            if cluster == doc_id:
+                conn.executemany(
+                    "INSERT INTO bands (band, bucket, doc_id) VALUES (?, ?, ?)",
+                    [(band, int(bucket), doc_id) for band, bucket in enumerate(buckets[j])]
+                )
+
+            added += 1
+
+    return added
+
+
+# limit: chỉ hash limit byte đầu (kiểm tra phần cũ của file có còn nguyên)
+def file_sha1(path, limit=None):
+
+    h = hashlib.sha1()
+    left = os.path.getsize(path) if limit is None else limit
+
+    with open(path, "rb") as f:
+        while left > 0:
+            block = f.read(min(1 << 20, left))
+            if not block:
+                break
+            h.update(block)
+            left -= len(block)
+
+    return h.hexdigest()
+
+
+# số dòng CSV đã index từ lần trước: file chỉ được ghi nối (phần đầu còn nguyên
+# như lúc index) → bỏ qua chừng ấy dòng, không thì đọc lại từ đầu
+def indexed_rows(conn, path, size):
+
+    row = conn.execute(
+        "SELECT sha1, size, rows FROM files WHERE path = ?", (path,)
+    ).fetchone()
+
+    if not row:
+        return 0
+
+    old_sha1, old_size, old_rows = row
+
+    if old_size is not None and old_rows is not None and old_size <= size \
+            and file_sha1(path, old_size) == old_sha1:
+        return old_rows
+
+    # file bị ghi đè / sửa giữa chừng: text cũ bị đếm copies thêm lần nữa
+    print(f"⚠️ {path} đã bị sửa (không chỉ ghi nối) → index lại cả file")
+
+    return 0
+
+
+# chỉ index file mới / phần mới ghi thêm
+def index_files(conn, paths, chunk_size=CHUNK_SIZE):
+
+    for path in paths:
+
+        size = os.path.getsize(path)
+        sha1 = file_sha1(path)
+
+        row = conn.execute("SELECT sha1 FROM files WHERE path = ?", (path,)).fetchone()
+
+        if row and row[0] == sha1:
+            continue
+
+        skip = indexed_rows(conn, path, size)
+
+        added = 0
+        rows = 0
+
+        try:
+            for chunk in pd.read_csv(path, chunksize=chunk_size, usecols=["text"]):
+
+                start = rows
+                rows += len(chunk)
+
+                # dòng đã index lần trước (đếm theo dòng CSV, trước dropna)
+                if rows <= skip:
+                    continue
+
+                chunk = chunk.iloc[max(0, skip - start):]
+
+                texts = chunk["text"].dropna().astype(str).tolist()
+                added += add_texts(conn, texts, os.path.basename(path))
+        except Exception as e:
+            print(f"❌ Lỗi {path}: {e}")
+            continue
+
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO files (path, sha1, size, rows) VALUES (?, ?, ?, ?)",
+                (path, sha1, size, rows)
+            )
+
+        print(f"✅ {path}: +{added} docs" + (f" (bỏ qua {skip} dòng đã index)" if skip else ""))
+
+
+# ======================
+# QUERY / EXPORT
+# ======================
+
+def duplicate_clusters(conn, min_size=2):
+
+    return pd.read_sql_query("""
+        SELECT d.cluster, c.size, d.id AS doc_id, d.copies, d.source, d.text
+        FROM docs d
+        JOIN (
+            SELECT cluster, SUM(copies) AS size FROM docs GROUP BY cluster
+        ) c ON c.cluster = d.cluster
+        WHERE c.size >= ?
+        ORDER BY c.size DESC, d.cluster, d.id
+    """, conn, params=(min_size,))
+
+
+# cluster của từng text (None nếu không gần trùng doc nào trong index)
+def find_duplicates(conn, texts, threshold=DUP_THRESHOLD):
+
+    norm = [normalize_vi(t) for t in texts]
+    sigs = aug_quality.signatures(norm)
+    buckets = band_buckets(sigs)
+
+    found = []
+
+    for sig, row in zip(sigs, buckets):
+
+        match = None
+
+        for band, bucket in enumerate(row):
+
+            for doc_id, cand_sig, cluster in conn.execute("""
+                SELECT d.id, d.sig, d.cluster
+                FROM bands b JOIN docs d ON d.id = b.doc_id
+                WHERE b.band = ? AND b.bucket = ?
+            """, (band, int(bucket))):
+
+                if (np.frombuffer(cand_sig, dtype=np.uint32) == sig).mean() >= threshold:
+                    match = cluster
+                    break
+
+            if match is not None:
+                break
+
+        found.append(match)
+
+    return found
+
+
+# ======================
+# CLI
+# ======================
+
+if __name__ == "__main__":
+
+    import argparse
+    import glob
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=DB_FILE)
+
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    idx = sub.add_parser("index")
+    idx.add_argument("patterns", nargs="+")
+
+    exp = sub.add_parser("clusters")
+    exp.add_argument("--output", "-o", required=True)
+    exp.add_argument("--min-size", type=int, default=2)
+
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+
+    if args.command == "index":
+        paths = sorted({p for pat in args.patterns for p in glob.glob(pat)})
+        index_files(conn, paths)
+
+    else:
+        df = duplicate_clusters(conn, args.min_size)
+        df.to_csv(args.output, index=False)
+        print(f"💾 {df['cluster'].nunique()} cluster, {len(df)} docs → {args.output}")
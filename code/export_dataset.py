@@ -0,0 +1,302 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+import features
+import store
+
+
+# ======================
+# CONFIG
+# ======================
+
+LABELED_INPUT = ["output_labeled/11k_google_maps_reviews.csv"]
+AUGMENTED_INPUT = ["augmented_output/reviews_augmented*.csv"]
+
+OUTPUT_DIR = "dataset"
+MANIFEST_FILE = "manifest.json"
+
+LABEL_COLS = store.LABEL_COLS
+LABEL_VALUES = [0, 1, 2, 3]
+
+SPLITS = {"train": 0.8, "val": 0.1, "test": 0.1}
+
+SEED = 42
+
+# "parquet": nén, đọc stream theo row group
+# "arrow":   Arrow IPC không nén, memory-map được (pa.memory_map)
+FORMAT = "parquet"
+SHARD_ROWS = 50000
+
+SCHEMA = pa.schema([
+    ("text", pa.string()),
+    ("food", pa.int8()),
+    ("service", pa.int8()),
+    ("place", pa.int8()),
+    ("price", pa.int8()),
+    ("is_augmented", pa.bool_()),
+    ("group", pa.string()),
+    ("word_count", pa.int32()),
+])
+
+
+# ======================
+# LOAD
+# ======================
+
+def read_csvs(patterns):
+
+    paths = sorted({p for pattern in patterns for p in glob.glob(pattern)})
+
+    if not paths:
+        return pd.DataFrame(), paths
+
+    df = pd.concat(
+        [store.normalize_columns(pd.read_csv(p)) for p in paths],
+        ignore_index=True
+    )
+
+    return df, paths
+
+
+# original: text + 4 label; augmented: original + augmented + 4 label
+def load_inputs(labeled, augmented, from_store=False):
+
+    if from_store:
+        conn = store.connect()
+        return (
+            store.read_view(conn, "v_labeled"),
+            store.read_view(conn, "v_augmented"),
+            [store.DB_FILE],
+        )
+
+    orig, orig_paths = read_csvs(labeled)
+    aug, aug_paths = read_csvs(augmented)
+
+    if not aug.empty and not {"original", "augmented"} <= set(aug.columns):
+        raise ValueError(
+            "File augmented cần cột original + augmented để giữ chung split với câu gốc"
+        )
+
+    return orig, aug, orig_paths + aug_paths
+
+
+def valid_labels(df):
+    return df[LABEL_COLS].isin(LABEL_VALUES).all(axis=1)
+
+
+# 1 dòng / câu, group = hash câu gốc → câu augmented đi theo câu gốc của nó
+def build_rows(orig, aug):
+
+    orig = orig.dropna(subset=["text"])
+    orig = orig[valid_labels(orig)]
+
+    orig = pd.DataFrame({
+        "text": orig["text"].astype(str),
+        **{c: orig[c].astype(int) for c in LABEL_COLS},
+        "is_augmented": False,
+        "group": features.text_hashes(orig["text"]),
+    }).drop_duplicates(subset="group")
+
+    parts = [orig]
+
+    if not aug.empty:
+        aug = aug.dropna(subset=["original", "augmented"])
+        aug = aug[valid_labels(aug)]
+
+        parts.append(pd.DataFrame({
+            "text": aug["augmented"].astype(str),
+            **{c: aug[c].astype(int) for c in LABEL_COLS},
+            "is_augmented": True,
+            "group": features.text_hashes(aug["original"]),
+        }))
+
+    rows = pd.concat(parts, ignore_index=True)
+
+    # augmented trùng y câu gốc / trùng nhau trong cùng group → bỏ
+    rows = rows.drop_duplicates(subset=["group", "text"])
+
+    rows["word_count"] = features.word_count(rows["text"])
+
+    return rows.reset_index(drop=True)
+
+
+# ======================
+# SPLIT
+# ======================
+
+# stratify theo combination 4 label trên group (không phải trên dòng):
+# trong mỗi combination xáo group rồi chia theo vị trí (rank + 0.5) / n,
+# combination chỉ 1-2 group rơi hết vào train
+def assign_splits(rows, splits=SPLITS, seed=SEED):
+
+    # label của group = label câu gốc; group chỉ có augmented → dòng đầu tiên
+    groups = (
+        rows.sort_values("is_augmented", kind="stable")
+        .drop_duplicates(subset="group")[["group"] + LABEL_COLS]
+    )
+
+    rng = np.random.default_rng(seed)
+
+    groups = groups.iloc[rng.permutation(len(groups))]
+
+    by_combo = groups.groupby(LABEL_COLS, sort=False)
+
+    pos = (by_combo.cumcount() + 0.5) / by_combo["group"].transform("size")
+
+    names = list(splits)
+    bounds = np.cumsum([splits[n] for n in names])
+    bounds[-1] = np.inf
+
+    split_of = pd.Series(
+        np.array(names)[np.searchsorted(bounds, pos.to_numpy(), side="right")],
+        index=groups["group"].to_numpy(),
+    )
+
+    return rows.assign(split=rows["group"].map(split_of))
+
+
+# ======================
+# WRITE
+# ======================
+
+def file_sha256(path):
+
+    h = hashlib.sha256()
+
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+
+    return h.hexdigest()
+
+
+def write_shard(table, path, fmt):
+
+    if fmt == "parquet":
+        pq.write_table(table, path, compression="zstd")
+        return
+
+    with pa.OSFile(path, "wb") as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def label_distribution(df):
+    return {
+        c: {int(k): int(v) for k, v in df[c].value_counts().sort_index().items()}
+        for c in LABEL_COLS
+    }
+
+
+def export(orig, aug, out_dir=OUTPUT_DIR, splits=SPLITS, seed=SEED, fmt=FORMAT,
+           shard_rows=SHARD_ROWS, sources=()):
+
+    rows = assign_splits(build_rows(orig, aug), splits, seed)
+
+    # ghi vào thư mục tạm rồi đổi tên → loader không bao giờ thấy bản ghi dở
+    tmp_dir = out_dir.rstrip("/\\") + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    ext = "parquet" if fmt == "parquet" else "arrow"
+
+    manifest = {
+        "created_at": time.time(),
+        "format": fmt,
+        "schema": {f.name: str(f.type) for f in SCHEMA},
+        "label_cols": LABEL_COLS,
+        "splits": splits,
+        "seed": seed,
+        "sources": [os.path.basename(s) for s in sources],
+        "groups": int(rows["group"].nunique()),
+        "rows": len(rows),
+        "files": {},
+    }
+
+    for split_no, name in enumerate(splits):
+
+        # xáo dòng trong split để loader stream tuần tự vẫn trộn đều label
+        part = rows[rows["split"] == name]
+        part = part.iloc[np.random.default_rng([seed, split_no]).permutation(len(part))]
+
+        shards = []
+
+        for i, start in enumerate(range(0, len(part), shard_rows)):
+
+            chunk = part.iloc[start:start + shard_rows]
+
+            table = pa.Table.from_pandas(
+                chunk[SCHEMA.names], schema=SCHEMA, preserve_index=False
+            )
+
+            file_name = f"{name}-{i:05d}.{ext}"
+            path = os.path.join(tmp_dir, file_name)
+
+            write_shard(table, path, fmt)
+
+            shards.append({
+                "file": file_name,
+                "rows": len(chunk),
+                "sha256": file_sha256(path),
+            })
+
+        manifest["files"][name] = {
+            "rows": len(part),
+            "original": int((~part["is_augmented"]).sum()),
+            "augmented": int(part["is_augmented"].sum()),
+            "labels": label_distribution(part),
+            "shards": shards,
+        }
+
+        print(f"📦 {name}: {len(part)} rows ({manifest['files'][name]['augmented']} augmented), "
+              f"{len(shards)} shard")
+
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+
+    print(f"\n✅ {out_dir}/{MANIFEST_FILE}: {len(rows)} rows, {manifest['groups']} group")
+
+    return manifest
+
+
+# ======================
+# CLI
+# ======================
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--labeled", "-l", nargs="+", default=LABELED_INPUT)
+    parser.add_argument("--augmented", "-a", nargs="*", default=AUGMENTED_INPUT)
+    parser.add_argument("--from-store", action="store_true")
+    parser.add_argument("--output", "-o", default=OUTPUT_DIR)
+    parser.add_argument("--format", choices=["parquet", "arrow"], default=FORMAT)
+    parser.add_argument("--shard-rows", type=int, default=SHARD_ROWS)
+    parser.add_argument("--val", type=float, default=SPLITS["val"])
+    parser.add_argument("--test", type=float, default=SPLITS["test"])
+    parser.add_argument("--seed", type=int, default=SEED)
+
+    args = parser.parse_args()
+
+    splits = {"train": 1 - args.val - args.test, "val": args.val, "test": args.test}
+
+    orig, aug, sources = load_inputs(args.labeled, args.augmented, args.from_store)
+
+    print(f"Original: {len(orig)}, augmented: {len(aug)}")
+
+    export(orig, aug, args.output, splits, args.seed, args.format, args.shard_rows, sources)
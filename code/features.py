@@ -0,0 +1,124 @@
+import hashlib
+import re
+import unicodedata
+
+import pandas as pd
+
+
+# ======================
+# CONFIG
+# ======================
+
+# cột tính 1 lần lúc ingest, lưu cạnh review (xem store.py)
+FEATURE_COLS = ["word_count", "char_len", "rating_num", "has_non_vi", "text_hash"]
+
+# "1 sao" / "5 stars" → 1 / 5
+RATING_RE = re.compile(r"(\d+)")
+
+# chữ cái ngoài Latin: Hy Lạp/Cyrillic, Do Thái/Ả Rập, Thái, Hàn, Kana, Hán.
+# viết bằng ký tự thật, không dùng \w / \u: pandas + pyarrow chạy regex bằng RE2
+NON_LATIN_RE = re.compile(
+    "[\u0370-\u052F\u0590-\u06FF\u0E00-\u0E7F\u1100-\u11FF"
+    "\u3040-\u30FF\u3400-\u4DBF\u4E00-\u9FFF\uAC00-\uD7AF]"
+)
+
+# chữ cái chỉ tiếng Việt có; câu >= MIN_WORDS_NO_MARK từ mà không có chữ nào
+# → tiếng Anh/Pháp/... (tiếng Việt không dấu cũng bị tính vào đây)
+VI_MARKS = "ăâđêôơưàáảãạằắẳẵặầấẩẫậèéẻẽẹềếểễệìíỉĩịòóỏõọồốổỗộờớởỡợùúủũụừứửữựỳýỷỹỵ"
+VI_MARK_RE = re.compile(f"[{VI_MARKS}{VI_MARKS.upper()}]")
+MIN_WORDS_NO_MARK = 5
+
+
+# ======================
+# FEATURES
+# ======================
+
+# tất cả nhận pandas Series, chạy qua .str thay vì apply từng dòng
+
+# NaN → "" (pandas 3 astype(str) giữ nguyên NaN)
+def as_text(texts):
+    return texts.fillna("").astype(str)
+
+
+# = len(str.split()), kể cả khoảng trắng unicode (\xa0,...) mà \S của RE2 không tính
+def word_count(texts):
+    return as_text(texts).str.split().str.len()
+
+
+def char_len(texts):
+    return as_text(texts).str.len()
+
+
+def rating_number(ratings):
+    return pd.to_numeric(
+        ratings.astype(str).str.extract(RATING_RE, expand=False),
+        errors="coerce"
+    )
+
+
+def has_non_vietnamese(texts):
+
+    # text dạng tổ hợp (NFD) thì dấu tách khỏi chữ, VI_MARK_RE không khớp
+    texts = as_text(texts).str.normalize("NFC")
+
+    return texts.str.contains(NON_LATIN_RE) | (
+        ~texts.str.contains(VI_MARK_RE) & (word_count(texts) >= MIN_WORDS_NO_MARK)
+    )
+
+
+# NFC + chữ thường + gộp khoảng trắng: cùng 1 review dù lưu dạng dựng sẵn (NFC)
+# hay tổ hợp (NFD) vẫn ra 1 hash. store.text_hash dùng lại hàm này → join được
+# với bảng labels
+def text_hash(text):
+    text = " ".join(unicodedata.normalize("NFC", str(text)).lower().split())
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+# từng dòng bằng Python thay vì .str: lower/split của pyarrow có thể lệch với
+# str.lower/str.split → hash phải khớp tuyệt đối với text_hash
+def text_hashes(texts):
+    return pd.Series(
+        [text_hash(t) for t in as_text(texts)],
+        index=texts.index,
+        dtype=object,
+    )
+
+
+def add_features(df, text_col="text", rating_col="rating"):
+
+    df = df.copy()
+
+    texts = df[text_col]
+
+    df["word_count"] = word_count(texts)
+    df["char_len"] = char_len(texts)
+    df["has_non_vi"] = has_non_vietnamese(texts)
+    df["text_hash"] = text_hashes(texts)
+
+    if rating_col in df.columns:
+        df["rating_num"] = rating_number(df[rating_col])
+
+    return df
+
+
+# ======================
+# CLI
+# ======================
+
+# thêm cột feature cho CSV cũ (notebook đọc thẳng, khỏi tính lại)
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", "-i", required=True)
+    parser.add_argument("--output", "-o", required=True)
+    parser.add_argument("--text-col", default="text")
+
+    args = parser.parse_args()
+
+    df = add_features(pd.read_csv(args.input), args.text_col)
+
+    df.to_csv(args.output, index=False)
+
+    print(f"💾 {args.output}: {len(df)} rows, +{[c for c in FEATURE_COLS if c in df.columns]}")
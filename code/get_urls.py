@@ -4,9 +4,13 @@ import os
 from playwright.async_api import async_playwright
 from typing import List
 
+import rate_limit
+
 PROFILE_DIR = "chrome_profile"
 TARGET_PLACES = 0
 
+QUERIES = ["quán ăn", "nhà hàng", "ăn uống", "đồ ăn", "quán ăn ngon", "địa điểm ăn uống", "cơm", "cơm tấm", "cơm gà", "cơm niêu", "cơm văn phòng", "quán cơm", "phở", "bún bò", "bún riêu", "bún đậu", "hủ tiếu", "mì quảng", "bánh canh", "gà rán", "pizza", "hamburger", "đồ ăn nhanh", "lẩu", "nướng", "buffet", "bbq", "quán nướng", "hải sản", "ốc", "quán ốc", "ăn vặt", "trà sữa", "chè", "bánh tráng", "xiên que", "cafe", "quán cafe", "cà phê", "coffee", "bánh mì", "bánh xèo", "nem nướng", "gỏi cuốn", "sushi", "ramen", "tokbokki", "hotpot", "korean bbq", "quán ăn đêm", "ăn khuya", "quán nhậu"]
+
 
 async def search_google_maps(page, query: str, location: str = "Việt Nam"):
 
@@ -18,7 +22,7 @@ async def search_google_maps(page, query: str, location: str = "Việt Nam"):
         f"?hl=vi"
     )
 
-    await page.goto(search_url, wait_until="networkidle")
+    await rate_limit.goto(page, search_url, wait_until="networkidle")
 
     await page.wait_for_timeout(3000)
 
@@ -101,7 +105,7 @@ async def search_and_save_urls(
 
                 print(f"\n[{i}/{len(queries)}]")
 
-                urls = await search_google_maps(page, query)
+                urls = await rate_limit.retry_blocked(search_google_maps, page, query)
 
                 for url in urls:
 
@@ -131,10 +135,9 @@ async def search_and_save_urls(
 
 if __name__ == "__main__":
     # Search Google Maps for restaurants nearby and save URLs
-    queries = ["quán ăn", "nhà hàng", "ăn uống", "đồ ăn", "quán ăn ngon", "địa điểm ăn uống", "cơm", "cơm tấm", "cơm gà", "cơm niêu", "cơm văn phòng", "quán cơm", "phở", "bún bò", "bún riêu", "bún đậu", "hủ tiếu", "mì quảng", "bánh canh", "gà rán", "pizza", "hamburger", "đồ ăn nhanh", "lẩu", "nướng", "buffet", "bbq", "quán nướng", "hải sản", "ốc", "quán ốc", "ăn vặt", "trà sữa", "chè", "bánh tráng", "xiên que", "cafe", "quán cafe", "cà phê", "coffee", "bánh mì", "bánh xèo", "nem nướng", "gỏi cuốn", "sushi", "ramen", "tokbokki", "hotpot", "korean bbq", "quán ăn đêm", "ăn khuya", "quán nhậu"]
     
     urls = asyncio.run(search_and_save_urls(
-        queries=queries,
+        queries=QUERIES,
         output_file="urls.txt"
     ))
     print(f"\n✨ Total Google Maps URLs ready for scraper: {len(urls)}")
@@ -2,12 +2,19 @@ import asyncio
 import json
 import os
 import re
+import socket
 import time
 from datetime import datetime
 
 import pandas as pd
 from playwright.async_api import async_playwright
 
+import chat_reply
+import label_ledger
+import page_lifecycle
+import prelabel
+import store
+
 
 # ======================
 # CONFIG
@@ -18,18 +25,45 @@ OUTPUT_DIR = "output_labeled"
 
 CHATGPT_URL = "https://chat.openai.com/chat"
 
+PROFILE_DIR = "chrome_profile"
+
 START_AT_INDEX = 0
 
-BATCH_SIZE = 20
-POST_GENERATION_DELAY = 2
+# batch được đóng gói theo số ký tự, không theo số review cố định
+MIN_BATCH_SIZE = 5
+MAX_BATCH_SIZE = 40
+
+BATCH_CHAR_BUDGET = 3000
+MIN_CHAR_BUDGET = 800
+MAX_CHAR_BUDGET = 12000
+
+# điều chỉnh budget theo latency / lỗi đo được (AIMD)
+TARGET_LATENCY = 45
+BUDGET_STEP = 400
+BUDGET_BACKOFF = 0.6
+
 SLEEP_BETWEEN_BATCH = 2
 REFRESH_AFTER_BATCH = 5
 
+# mở tab mới sau bấy nhiêu batch (xem page_lifecycle.py)
+PAGE_MAX_TASKS = 50
+
 MAX_RETRY = 3
 
-CHECKPOINT_FILE = os.path.join(OUTPUT_DIR, "checkpoint.txt")
+# review đơn giản được gán nhãn bằng luật, không gọi model.
+# tắt mặc định: label luật lệch label model ~1/10 và đi thẳng vào dữ liệu train;
+# --prelabel chỉ bật khi prelabel.agreement_ok() đạt ngưỡng
+USE_PRELABEL = False
 
-WAIT_ICON = 'svg use[href*="#bbf3a9"]'
+# ghi label vào SQLite store (xem store.py)
+USE_STORE = True
+STORE_CONN = None
+
+LABEL_KEYS = ["food", "service", "place", "price"]
+LABEL_VALUES = {0, 1, 2, 3}
+
+CHECKPOINT_FILE = os.path.join(OUTPUT_DIR, "checkpoint.txt")
+DEAD_LETTER_FILE = os.path.join(OUTPUT_DIR, "dead_letter.csv")
 
 INPUT_SELECTORS = [
     "div[contenteditable='true']",
@@ -37,12 +71,6 @@ INPUT_SELECTORS = [
     "div[role='textbox']",
 ]
 
-REPLY_SELECTORS = [
-    "div.markdown",
-    "div.prose",
-    "article",
-]
-
 
 # ======================
 # CHECKPOINT
@@ -92,36 +120,6 @@ async def find_input_box(page):
     raise RuntimeError("ChatGPT input box not found")
 
 
-async def wait_for_generation(page, timeout=120):
-    start = time.time()
-
-    while True:
-        generating = await page.locator(WAIT_ICON).count() > 0
-
-        if not generating:
-            await asyncio.sleep(POST_GENERATION_DELAY)
-            return
-
-        if time.time() - start > timeout:
-            raise TimeoutError("Generation timeout")
-
-        await asyncio.sleep(0.5)
-
-
-async def get_last_reply(page):
-    for sel in REPLY_SELECTORS:
-        nodes = page.locator(sel)
-        count = await nodes.count()
-
-        if count > 0:
-            last_node = nodes.nth(count - 1)
-            text = await last_node.inner_text()
-            if text.strip():
-                return text.strip()
-
-    raise RuntimeError("No reply found")
-
-
 # ======================
 # JSON PARSER
 # ======================
@@ -148,7 +146,8 @@ def extract_json(text):
 # ======================
 
 def build_prompt(texts, batch_size):
-    json_input = json.dumps(texts, ensure_ascii=False, indent=2)
+    items = [{"id": i, "text": t} for i, t in enumerate(texts)]
+    json_input = json.dumps(items, ensure_ascii=False, indent=2)
 
     return f"""
 Bạn là chuyên gia Aspect-Based Sentiment Analysis (ABSA) cho review nhà hàng/quán ăn.
@@ -177,19 +176,19 @@ QUY TẮC:
 6. MIXED sentiment → neutral (3)
 
 INPUT:
-- Batch gồm {BATCH_SIZE} review
+- Batch gồm {batch_size} review, mỗi review có "id" và "text"
 
 OUTPUT:
 - Chỉ trả về DUY NHẤT JSON:
 results:
 [
-  {{"food": 0, "service": 0, "place": 0, "price": 0}},
+  {{"id": 0, "food": 0, "service": 0, "place": 0, "price": 0}},
   ...
 ]
 
 RÀNG BUỘC BẮT BUỘC:
-- results MUST có đúng {BATCH_SIZE} phần tử
-- results[i] tương ứng input[i]
+- results MUST có đúng {batch_size} phần tử
+- results[i] tương ứng input[i], giữ nguyên "id" của input
 - KHÔNG được thiếu hoặc thừa bất kỳ object nào
 - Nếu thiếu thông tin → aspect = 0 (không được bỏ qua)
 
@@ -200,6 +199,77 @@ DỮ LIỆU:
 {json_input}
 """
 
+
+# ======================
+# RESULT VALIDATION
+# ======================
+
+def validate_label(obj):
+    if not isinstance(obj, dict):
+        return None
+
+    label = {}
+
+    for key in LABEL_KEYS:
+        try:
+            value = int(obj[key])
+        except:
+            return None
+
+        if value not in LABEL_VALUES:
+            return None
+
+        label[key] = value
+
+    return label
+
+
+# map results (có thể lỗi) vào n slot, slot lỗi = None
+def salvage_results(results, n):
+    labels = [None] * n
+
+    if not isinstance(results, list):
+        return labels
+
+    has_ids = all(isinstance(r, dict) and "id" in r for r in results)
+
+    if has_ids:
+        for r in results:
+            try:
+                i = int(r["id"])
+            except:
+                continue
+
+            if 0 <= i < n and labels[i] is None:
+                labels[i] = validate_label(r)
+
+    elif len(results) == n:
+        # không có id → chỉ tin thứ tự khi đủ số lượng
+        for i, r in enumerate(results):
+            labels[i] = validate_label(r)
+
+    return labels
+
+
+# ghi vào store nữa để v_unlabeled không đưa review này cho model ở lần chạy sau
+def write_dead_letter(text, reason):
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    if USE_STORE:
+        store.add_skipped(get_store(), [text], f"dead_letter: {reason}")
+
+    pd.DataFrame([{
+        "text": text,
+        "reason": reason,
+        "time": datetime.now().isoformat(timespec="seconds"),
+    }]).to_csv(
+        DEAD_LETTER_FILE,
+        mode="a",
+        header=not os.path.exists(DEAD_LETTER_FILE),
+        index=False
+    )
+
+
 # ======================
 # GENERATION WITH RETRY
 # ======================
@@ -209,79 +279,183 @@ async def reset_chatgpt(page):
     await page.goto(CHATGPT_URL)
     await page.wait_for_load_state("networkidle")
     await asyncio.sleep(3)
-async def generate_labels_batch(page, texts, batch_size):
 
-    for attempt in range(MAX_RETRY):
 
-        print(f"\nBatch attempt {attempt + 1}/{MAX_RETRY}")
+# gửi 1 prompt, trả về label từng item (None = không hợp lệ)
+async def ask_labels(page, texts):
+    input_box = await find_input_box(page)
 
-        try:
-            input_box = await find_input_box(page)
-        except:
-            print("❌ Input box not found")
-            await reset_chatgpt(page)
-            continue
+    prompt = build_prompt(texts, len(texts))
 
-        prompt = build_prompt(texts, batch_size)
+    await chat_reply.mark_replies_seen(page)
 
-        await input_box.click()
+    await input_box.click()
 
-        try:
-            await input_box.fill(prompt)
-        except:
-            await input_box.type(prompt, delay=5)
+    try:
+        await input_box.fill(prompt)
+    except:
+        await input_box.type(prompt, delay=5)
+
+    await input_box.press("Enter")
+
+    reply = await chat_reply.wait_for_reply(page)
+
+    print("RAW:", reply[:300])
+
+    data = extract_json(reply)
+
+    if not isinstance(data, dict) or "results" not in data:
+        raise ValueError("Missing results key")
+
+    return salvage_results(data["results"], len(texts))
+
+
+# giữ lại mọi item hợp lệ, chỉ hỏi lại item thiếu/lỗi.
+# batch nhiều review lỗi cứng (exception) → chia đôi ngay để cô lập review "độc",
+# chỉ review đơn lẻ mới được thử đủ MAX_RETRY lần (mỗi lần lỗi = 1 lần reload),
+# vẫn lỗi → ghi DEAD_LETTER_FILE và trả về None.
+# on_attempt() gọi trước mỗi lần hỏi (kể cả khi bisect); trả về False → dừng,
+# phần chưa có label để None nhưng không ghi dead-letter
+async def generate_labels_batch(page, texts, stats=None, on_attempt=None):
+    labels = [None] * len(texts)
+
+    if stats is None:
+        stats = {}
+
+    for attempt in range(MAX_RETRY):
+
+        pending = [i for i, lab in enumerate(labels) if lab is None]
+
+        if not pending:
+            return labels
+
+        if on_attempt is not None and not on_attempt():
+            stats["aborted"] = True
+            return labels
 
-        await input_box.press("Enter")
+        print(f"\nBatch attempt {attempt + 1}/{MAX_RETRY} ({len(pending)}/{len(texts)} pending)")
+
+        stats["attempts"] = stats.get("attempts", 0) + 1
 
         try:
-            await wait_for_generation(page)
-            reply = await get_last_reply(page)
+            partial = await ask_labels(page, [texts[i] for i in pending])
         except Exception as e:
+            stats["errors"] = stats.get("errors", 0) + 1
             print("❌ Generation failed:", e)
             await reset_chatgpt(page)
-            continue
 
-        print("RAW:", reply[:300])
+            if len(pending) > 1:
+                break
 
-        try:
-            data = extract_json(reply)
-        except Exception as e:
-            print("❌ JSON parse fail:", e)
-            await reset_chatgpt(page)
             continue
 
-        if "results" not in data:
-            print("❌ Missing results key")
-            await reset_chatgpt(page)
-            continue
+        for i, lab in zip(pending, partial):
+            if lab is not None:
+                labels[i] = lab
 
-        results = data["results"]
+        missing = sum(lab is None for lab in partial)
+
+        if missing:
+            stats["errors"] = stats.get("errors", 0) + 1
+            print(f"⚠️ Salvaged {len(partial) - missing}/{len(partial)}, re-asking {missing}")
+
+    pending = [i for i, lab in enumerate(labels) if lab is None]
+
+    if not pending:
+        return labels
+
+    if len(pending) == 1:
+        i = pending[0]
+        print("☠️ Dead-letter:", texts[i][:80])
+        write_dead_letter(texts[i], f"failed after {MAX_RETRY} retries")
+        return labels
+
+    # ✂️ BISECT
+    mid = len(pending) // 2
+
+    for half in (pending[:mid], pending[mid:]):
+
+        if stats.get("aborted"):
+            break
+
+        print(f"✂️ Bisect: {len(half)} review")
+        sub = await generate_labels_batch(page, [texts[i] for i in half], stats, on_attempt)
+
+        for i, lab in zip(half, sub):
+            labels[i] = lab
+
+    return labels
+
+
+# ======================
+# BATCH PACKING
+# ======================
+
+def new_budget():
+    return {"chars": BATCH_CHAR_BUDGET}
 
-        if len(results) != len(texts):
-            print(f"❌ Mismatch: got {len(results)} expected {len(texts)}")
-            await reset_chatgpt(page)
-            continue
 
-        # ✅ SUCCESS
-        return results
+# đủ budget ký tự hoặc MAX_BATCH_SIZE → đóng batch
+def batch_is_full(batch_texts, next_text, budget):
+    if len(batch_texts) >= MAX_BATCH_SIZE:
+        return True
 
-    raise RuntimeError("Batch failed after retries")
+    if len(batch_texts) < MIN_BATCH_SIZE:
+        return False
+
+    chars = sum(len(t) for t in batch_texts)
+
+    return chars + len(next_text) > budget["chars"]
+
+
+def update_budget(budget, latency, stats):
+    chars = budget["chars"]
+
+    if stats.get("errors", 0) > 0 or latency > TARGET_LATENCY:
+        chars = int(chars * BUDGET_BACKOFF)
+    else:
+        chars += BUDGET_STEP
+
+    budget["chars"] = max(MIN_CHAR_BUDGET, min(MAX_CHAR_BUDGET, chars))
+
+    print(
+        f"📏 latency {latency:.1f}s, "
+        f"errors {stats.get('errors', 0)} → budget {budget['chars']} chars"
+    )
 
 
 # ======================
 # SAVE
 # ======================
 
-def save_batch(rows, labels, out_path, existing_texts):
+def get_store():
+    global STORE_CONN
+
+    if STORE_CONN is None:
+        STORE_CONN = store.connect()
+
+    return STORE_CONN
+
+
+def save_batch(rows, labels, out_path, existing_texts, source="model"):
+
+    if USE_STORE:
+        texts = [str(row.get("text", "")).strip() for row in rows]
+        store.add_labels(get_store(), texts, labels, source)
 
     for row, lab in zip(rows, labels):
 
+        # item đã vào dead-letter
+        if lab is None:
+            continue
+
         new_row = row.to_dict()
 
         new_row["food"] = lab["food"]
         new_row["service"] = lab["service"]
         new_row["place"] = lab["place"]
         new_row["price"] = lab["price"]
+        new_row["label_source"] = source
 
         df_out = pd.DataFrame([new_row])
 
@@ -299,10 +473,157 @@ def save_batch(rows, labels, out_path, existing_texts):
 # MAIN PIPELINE
 # ======================
 
-async def run(input_csv=None, headless=False):
+async def label_and_save(page, batch_rows, batch_texts, out_path, existing_texts, budget,
+                         on_attempt=None):
 
-    csv_path = input_csv or INPUT_FILE
-    df = pd.read_csv(csv_path)
+    print(f"\nProcessing batch: {len(batch_texts)} review, {sum(len(t) for t in batch_texts)} chars")
+
+    stats = {}
+    start = time.time()
+
+    labels = await generate_labels_batch(page, batch_texts, stats, on_attempt)
+
+    update_budget(budget, time.time() - start, stats)
+
+    save_batch(batch_rows, labels, out_path, existing_texts)
+
+
+# gom review thành batch cho 1 tab ChatGPT; label_rows và pipeline.label_worker
+# dùng chung. on_error(e, page): None → lỗi batch được raise lên
+def new_batcher(lc, out_path, existing_texts, budget, on_attempt=None, on_error=None):
+    return {
+        "lc": lc,
+        "out_path": out_path,
+        "existing_texts": existing_texts,
+        "budget": budget,
+        "on_attempt": on_attempt,
+        "on_error": on_error,
+        "rows": [],
+        "texts": [],
+        "batches": 0,
+    }
+
+
+# label batch đang gom (nếu có), sau REFRESH_AFTER_BATCH batch thì reset tab
+async def flush_batch(batcher):
+
+    rows, texts = batcher["rows"], batcher["texts"]
+
+    if not rows:
+        return
+
+    batcher["rows"], batcher["texts"] = [], []
+
+    lc = batcher["lc"]
+    page = await page_lifecycle.current_page(lc)
+
+    try:
+        await label_and_save(
+            page, rows, texts, batcher["out_path"], batcher["existing_texts"],
+            batcher["budget"], batcher["on_attempt"]
+        )
+    except Exception as e:
+        if batcher["on_error"] is None:
+            raise
+        await batcher["on_error"](e, page)
+
+    await page_lifecycle.task_done(lc)
+
+    batcher["batches"] += 1
+
+    if batcher["batches"] % REFRESH_AFTER_BATCH == 0 and lc["page"] is not None:
+        await reset_chatgpt(lc["page"])
+
+
+# review prelabel được → lưu ngay; không thì vào batch, batch cũ đã đủ
+# budget thì label trước. True = vừa label xong 1 batch
+async def add_review(batcher, row, text):
+
+    if USE_PRELABEL:
+        lab = prelabel.prelabel(text)
+
+        if lab is not None:
+            save_batch([row], [lab], batcher["out_path"], batcher["existing_texts"], source="rule")
+            return False
+
+    flushed = False
+
+    if batcher["rows"] and batch_is_full(batcher["texts"], text, batcher["budget"]):
+        await flush_batch(batcher)
+        flushed = True
+
+    batcher["rows"].append(row)
+    batcher["texts"].append(text)
+
+    return flushed
+
+
+# gán nhãn các hàng df (vị trí bắt đầu = start_pos),
+# gọi on_progress(vị trí hàng đầu tiên chưa xử lý) sau mỗi batch,
+# on_attempt() trước mỗi lần hỏi ChatGPT (xem generate_labels_batch).
+# row_ids: ghi cột row_id = vị trí trong input, chỉ có nghĩa ở chế độ sharded
+# (label_ledger.merge_results dedup range bị label 2 lần theo cột này)
+async def label_rows(lc, df, start_pos, out_path, existing_texts, budget, on_progress,
+                     on_attempt=None, row_ids=False):
+
+    batcher = new_batcher(lc, out_path, existing_texts, budget, on_attempt)
+
+    for pos, (_, row) in enumerate(df.iterrows(), start=start_pos):
+
+        text = str(row.get("text", "")).strip()
+
+        if not text:
+            continue
+
+        if text in existing_texts:
+            continue
+
+        if row_ids:
+            row = row.copy()
+            row["row_id"] = pos
+
+        if await add_review(batcher, row, text):
+
+            # hàng pos vừa vào batch mới, chưa label
+            if not await on_progress(pos):
+                return False
+
+            await asyncio.sleep(SLEEP_BETWEEN_BATCH)
+
+    await flush_batch(batcher)
+
+    return await on_progress(start_pos + len(df))
+
+
+# tab ChatGPT được thay sau PAGE_MAX_TASKS batch hoặc khi heap/RSS vượt ngưỡng,
+# login giữ nguyên nhờ profile persistent
+async def launch_chatgpt(p, profile_dir, headless):
+
+    async def launch():
+        return await p.chromium.launch_persistent_context(
+            user_data_dir=profile_dir,
+            headless=headless,
+            locale="vi-VN",
+            args=["--disable-blink-features=AutomationControlled"],
+        )
+
+    lc = page_lifecycle.new_lifecycle(
+        await launch(), setup=reset_chatgpt, relaunch=launch, max_tasks=PAGE_MAX_TASKS
+    )
+
+    await page_lifecycle.current_page(lc)
+
+    return lc
+
+
+async def run(input_csv=None, headless=False, profile_dir=PROFILE_DIR, from_store=False):
+
+    if from_store:
+        # view chỉ chứa review chưa có label → không cần checkpoint
+        df = store.read_view(get_store(), "v_unlabeled")
+    else:
+        csv_path = input_csv or INPUT_FILE
+        df = pd.read_csv(csv_path)
 
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
@@ -311,74 +632,89 @@ async def run(input_csv=None, headless=False):
 
     existing_texts = load_existing_texts(out_path)
 
-    start_index = load_checkpoint()
+    start_index = 0 if from_store else load_checkpoint()
     print("Resume from index:", start_index)
 
     df = df.iloc[start_index:]
 
-    global_index = start_index
+    budget = new_budget()
+
+    async def on_progress(pos):
+        # ✅ SAVE CHECKPOINT: hàng đầu tiên chưa xử lý
+        if not from_store:
+            save_checkpoint(pos)
+        return True
 
     async with async_playwright() as p:
 
-        browser = await p.chromium.launch_persistent_context(
-            user_data_dir="chrome_profile",
-            headless=headless,
-            locale="vi-VN",
-            args=["--disable-blink-features=AutomationControlled"],
-        )
+        lc = await launch_chatgpt(p, profile_dir, headless)
 
-        page = await browser.new_page()
-        await reset_chatgpt(page)
+        await label_rows(lc, df, start_index, out_path, existing_texts, budget, on_progress)
 
-        batch_rows, batch_texts = [], []
-        batch_counter = 0
+        await page_lifecycle.close(lc)
 
-        for _, row in df.iterrows():
+    print("DONE")
 
-            text = str(row.get("text", "")).strip()
 
-            if not text:
-                global_index += 1
-                continue
+# nhiều process chạy song song, mỗi process 1 profile riêng,
+# chia việc theo range trong label_ledger
+async def run_sharded(input_csv=None, headless=False, profile_dir=PROFILE_DIR, worker=None):
 
-            if text in existing_texts:
-                global_index += 1
-                continue
+    csv_path = input_csv or INPUT_FILE
+    df = pd.read_csv(csv_path)
 
-            batch_rows.append(row)
-            batch_texts.append(text)
+    # os.uname() không có trên Windows
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
 
-            if len(batch_rows) < BATCH_SIZE:
-                global_index += 1
-                continue
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    out_path = os.path.join(OUTPUT_DIR, f"labeled_{worker}_{ts}.csv")
+
+    conn = label_ledger.connect()
+    label_ledger.init_ledger(conn, os.path.abspath(csv_path), len(df))
 
-            print("\nProcessing batch...")
+    existing_texts = load_existing_texts(out_path)
 
-            labels = await generate_labels_batch(page, batch_texts, len(batch_texts))
+    budget = new_budget()
 
-            save_batch(batch_rows, labels, out_path, existing_texts)
+    async with async_playwright() as p:
 
-            # ✅ SAVE CHECKPOINT
-            save_checkpoint(global_index + len(batch_rows))
+        lc = await launch_chatgpt(p, profile_dir, headless)
 
-            batch_rows, batch_texts = [], []
-            batch_counter += 1
+        while True:
 
-            if batch_counter % REFRESH_AFTER_BATCH == 0:
-                await reset_chatgpt(page)
+            claimed = label_ledger.claim_range(conn, worker, out_path)
 
-            await asyncio.sleep(SLEEP_BETWEEN_BATCH)
+            if claimed is None:
+                break
 
-            global_index += 1
+            range_id, start_row, end_row = claimed
 
-        if batch_rows:
-            labels = await generate_labels_batch(page, batch_texts, len(batch_texts))
-            save_batch(batch_rows, labels, out_path, existing_texts)
-            save_checkpoint(global_index + len(batch_rows))
+            print(f"\n📥 [{worker}] range {range_id}: {start_row} → {end_row}")
 
-        await browser.close()
+            # gia hạn lease trước mỗi lần hỏi → lease chỉ cần dài hơn 1 attempt,
+            # batch retry + bisect lâu bao nhiêu cũng không bị reclaim giữa chừng
+            def on_attempt():
+                if not label_ledger.renew_lease(conn, range_id, worker):
+                    print(f"⚠️ Mất lease range {range_id}, bỏ qua phần còn lại")
+                    return False
+                return True
 
-    print("DONE")
+            async def on_progress(pos):
+                return on_attempt()
+
+            ok = await label_rows(
+                lc, df.iloc[start_row:end_row], start_row,
+                out_path, existing_texts, budget, on_progress, on_attempt, row_ids=True
+            )
+
+            if ok:
+                label_ledger.complete_range(conn, range_id, worker)
+
+        await page_lifecycle.close(lc)
+
+    print("DONE:", label_ledger.ledger_status(conn))
 
 
 # ======================
@@ -392,7 +728,22 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--input", "-i")
     parser.add_argument("--headless", action="store_true")
+    parser.add_argument("--profile", default=PROFILE_DIR)
+    parser.add_argument("--sharded", action="store_true")
+    parser.add_argument("--worker")
+    parser.add_argument("--prelabel", action="store_true")
+    parser.add_argument("--from-store", action="store_true")
+    parser.add_argument("--no-store", action="store_true")
 
     args = parser.parse_args()
 
-    asyncio.run(run(args.input, args.headless))
\ No newline at end of file
+    if args.prelabel:
+        USE_PRELABEL = prelabel.agreement_ok()
+
+    if args.no_store:
+        USE_STORE = False
+
+    if args.sharded:
+        asyncio.run(run_sharded(args.input, args.headless, args.profile, args.worker))
+    else:
+        asyncio.run(run(args.input, args.headless, args.profile, args.from_store))
\ No newline at end of file
@@ -0,0 +1,274 @@
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+import pandas as pd
+
+
+# ======================
+# CONFIG
+# ======================
+
+OUTPUT_DIR = "output_labeled"
+
+LEDGER_FILE = os.path.join(OUTPUT_DIR, "ledger.db")
+
+RANGE_SIZE = 500
+
+# label_data gia hạn lease trước mỗi lần hỏi ChatGPT → chỉ cần dài hơn
+# 1 attempt (timeout reply 120s + reset trang), không phải cả batch
+LEASE_SECONDS = 600
+
+LABEL_COLS = ["food", "service", "place", "price"]
+
+
+# ======================
+# LEDGER
+# ======================
+
+def connect(db_path=LEDGER_FILE):
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+    # isolation_level=None → tự quản lý transaction bằng BEGIN IMMEDIATE
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ranges (
+            id INTEGER PRIMARY KEY,
+            start_row INTEGER NOT NULL,
+            end_row INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            owner TEXT,
+            lease_until REAL,
+            out_path TEXT
+        )
+    """)
+
+    return conn
+
+
+# đọc - kiểm tra - ghi trong cùng 1 BEGIN IMMEDIATE: nhiều worker khởi động
+# cùng lúc thì chỉ worker đầu tiên tạo range, các worker sau thấy meta đã có.
+# ledger gắn với 1 input: khác đường dẫn hoặc số dòng (file đã đổi) → lỗi
+def init_ledger(conn, input_csv, n_rows, range_size=RANGE_SIZE):
+
+    conn.execute("BEGIN IMMEDIATE")
+
+    try:
+        row = conn.execute(
+            "SELECT value FROM meta WHERE key = 'input_csv'"
+        ).fetchone()
+
+        if row is not None:
+            if row[0] != input_csv:
+                raise RuntimeError(
+                    f"Ledger đang dùng cho {row[0]}, không phải {input_csv}"
+                )
+
+            ledger_rows = conn.execute("SELECT MAX(end_row) FROM ranges").fetchone()[0] or 0
+
+            if ledger_rows != n_rows:
+                raise RuntimeError(
+                    f"Ledger chia {ledger_rows} dòng nhưng {input_csv} có {n_rows} dòng "
+                    "→ input đã đổi, xoá ledger để chia lại"
+                )
+
+            conn.execute("COMMIT")
+            return
+
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('input_csv', ?)",
+            (input_csv,)
+        )
+
+        conn.executemany(
+            "INSERT INTO ranges (start_row, end_row) VALUES (?, ?)",
+            [
+                (start, min(start + range_size, n_rows))
+                for start in range(0, n_rows, range_size)
+            ]
+        )
+
+        conn.execute("COMMIT")
+
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    print(f"🗂️ Ledger: {n_rows} rows → {(n_rows + range_size - 1) // range_size} ranges")
+
+
+# lấy 1 range pending, hoặc range có lease đã hết hạn
+def claim_range(conn, owner, out_path, lease_seconds=LEASE_SECONDS):
+
+    now = time.time()
+
+    conn.execute("BEGIN IMMEDIATE")
+
+    row = conn.execute("""
+        SELECT id, start_row, end_row, owner
+        FROM ranges
+        WHERE status = 'pending'
+           OR (status = 'leased' AND lease_until < ?)
+        ORDER BY id
+        LIMIT 1
+    """, (now,)).fetchone()
+
+    if row is None:
+        conn.execute("COMMIT")
+        return None
+
+    range_id, start_row, end_row, old_owner = row
+
+    conn.execute("""
+        UPDATE ranges
+        SET status = 'leased', owner = ?, lease_until = ?, out_path = ?
+        WHERE id = ?
+    """, (owner, now + lease_seconds, out_path, range_id))
+
+    conn.execute("COMMIT")
+
+    if old_owner and old_owner != owner:
+        print(f"♻️ Reclaim range {range_id} từ {old_owner}")
+
+    return range_id, start_row, end_row
+
+
+def renew_lease(conn, range_id, owner, lease_seconds=LEASE_SECONDS):
+
+    cur = conn.execute("""
+        UPDATE ranges
+        SET lease_until = ?
+        WHERE id = ? AND owner = ? AND status = 'leased'
+    """, (time.time() + lease_seconds, range_id, owner))
+
+    # False → range đã bị worker khác reclaim
+    return cur.rowcount == 1
+
+
+def complete_range(conn, range_id, owner):
+
+    cur = conn.execute("""
+        UPDATE ranges
+        SET status = 'done', lease_until = NULL
+        WHERE id = ? AND owner = ?
+    """, (range_id, owner))
+
+    return cur.rowcount == 1
+
+
+def ledger_status(conn):
+
+    rows = conn.execute("""
+        SELECT status, COUNT(*), SUM(end_row - start_row)
+        FROM ranges
+        GROUP BY status
+    """).fetchall()
+
+    return {status: (n, n_rows) for status, n, n_rows in rows}
+
+
+# ======================
+# MERGE
+# ======================
+
+# chỉ gộp file output của các worker trong ledger này → row_id cùng 1 input,
+# không lẫn với file labeled_*.csv của lần chạy thường / input khác
+def merge_results(conn, output_dir=OUTPUT_DIR, out_path=None):
+
+    files = [
+        row[0] for row in conn.execute(
+            "SELECT DISTINCT out_path FROM ranges WHERE out_path IS NOT NULL ORDER BY out_path"
+        )
+    ]
+
+    all_data = []
+
+    for file_path in files:
+
+        if not os.path.exists(file_path):
+            print(f"⚠️ Không thấy {file_path}")
+            continue
+
+        try:
+            df = pd.read_csv(file_path)
+        except Exception as e:
+            print(f"❌ Lỗi {file_path}: {e}")
+            continue
+
+        missing = [c for c in ["text"] + LABEL_COLS if c not in df.columns]
+
+        if missing:
+            print(f"⚠️ Bỏ qua {file_path}: thiếu cột {missing}")
+            continue
+
+        df = df.dropna(subset=["text"])
+        df = df[df["text"].astype(str).str.strip() != ""]
+        df = df[df[LABEL_COLS].isin([0, 1, 2, 3]).all(axis=1)]
+
+        print(f"✅ {file_path}: {len(df)} rows")
+
+        all_data.append(df)
+
+    if not all_data:
+        print("⚠️ Ledger chưa có file labeled nào")
+        return None
+
+    merged = pd.concat(all_data, ignore_index=True)
+
+    # range bị reclaim có thể được label 2 lần → giữ bản đầu
+    if "row_id" in merged.columns:
+        has_id = merged["row_id"].notna()
+        merged = pd.concat([
+            merged[has_id].drop_duplicates(subset=["row_id"]),
+            merged[~has_id],
+        ])
+
+    merged = merged.drop_duplicates(subset=["text"])
+
+    if "row_id" in merged.columns:
+        merged = merged.sort_values("row_id", kind="stable")
+
+    if out_path is None:
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        out_path = os.path.join(output_dir, f"labeled_merged_{ts}.csv")
+
+    merged.to_csv(out_path, index=False)
+
+    print(f"💾 Merged {len(merged)} rows → {out_path}")
+
+    return out_path
+
+
+# ======================
+# CLI
+# ======================
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["status", "merge"])
+    parser.add_argument("--db", default=LEDGER_FILE)
+    parser.add_argument("--output", "-o")
+
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+
+    if args.command == "status":
+        for status, (n, n_rows) in ledger_status(conn).items():
+            print(f"{status:8s} {n:6d} ranges {n_rows or 0:8d} rows")
+
+    else:
+        merge_results(conn, out_path=args.output)
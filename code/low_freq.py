@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+import store
+
+
+# ======================
+# CONFIG
+# ======================
+
+INPUT_CSV = "output_labeled/11k_google_maps_reviews.csv"
+OUTPUT_CSV = "low_frequency_classes.csv"
+
+LABEL_COLS = store.LABEL_COLS
+
+# ngưỡng thử từ 1..MAX_THRESHOLD như notebook random.ipynb
+MAX_THRESHOLD = 999
+
+
+# ======================
+# KNEE
+# ======================
+
+def combo_counts(df):
+    return df.groupby(LABEL_COLS, sort=False)[LABEL_COLS[0]].transform("size")
+
+
+# số combination có count <= t, với mọi t, = searchsorted trên count đã sort
+# knee = điểm xa đường chéo nhất sau khi chuẩn hoá 2 trục về [0, 1]
+def find_threshold(counts, max_threshold=MAX_THRESHOLD):
+
+    counts = np.sort(np.asarray(counts))
+    thresholds = np.arange(1, max_threshold + 1)
+
+    low = np.searchsorted(counts, thresholds, side="right")
+
+    span = low.max() - low.min()
+
+    if span == 0:
+        return int(thresholds[0])
+
+    x = (thresholds - thresholds.min()) / (thresholds.max() - thresholds.min())
+    y = (low - low.min()) / span
+
+    return int(thresholds[np.argmax(y - x)])
+
+
+# ======================
+# SELECT
+# ======================
+
+def select_low_frequency(df, threshold=None, max_threshold=MAX_THRESHOLD):
+
+    df = store.normalize_columns(df).dropna(subset=LABEL_COLS)
+
+    count = combo_counts(df)
+
+    if threshold is None:
+        per_combo = df.assign(count=count).drop_duplicates(subset=LABEL_COLS)["count"]
+        threshold = find_threshold(per_combo, max_threshold)
+
+    out = df.assign(count=count)
+    out = out[out["count"] <= threshold]
+
+    # combination hiếm nhất lên đầu
+    return out.sort_values("count", kind="stable"), threshold
+
+
+def load_labeled(paths, from_store=False):
+
+    if from_store:
+        return store.read_view(store.connect(), "v_labeled")
+
+    return pd.concat(
+        [store.normalize_columns(pd.read_csv(p)) for p in paths],
+        ignore_index=True
+    )
+
+
+# ======================
+# CLI
+# ======================
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", "-i", nargs="+", default=[INPUT_CSV])
+    parser.add_argument("--output", "-o", default=OUTPUT_CSV)
+    parser.add_argument("--threshold", type=int)
+    parser.add_argument("--max-threshold", type=int, default=MAX_THRESHOLD)
+    parser.add_argument("--from-store", action="store_true")
+
+    args = parser.parse_args()
+
+    df = load_labeled(args.input, args.from_store)
+
+    low, threshold = select_low_frequency(df, args.threshold, args.max_threshold)
+
+    low.to_csv(args.output, index=False)
+
+    print(f"Số combination: {df.groupby(LABEL_COLS).ngroups}")
+    print(f"Threshold:      {threshold}")
+    print(f"💾 {args.output}: {len(low)} / {len(df)} rows, "
+          f"{low.groupby(LABEL_COLS).ngroups} combination")
@@ -0,0 +1,167 @@
+import json
+import os
+
+
+# ======================
+# REGISTRY
+# ======================
+
+# class của Google Maps bị obfuscate, đổi không báo trước.
+# mỗi key: danh sách selector theo thứ tự ưu tiên, cái đầu = bản đang dùng.
+# Maps đổi → thêm selector mới lên đầu (hoặc ghi đè bằng SELECTORS_FILE) và tăng VERSION
+VERSION = "2026.05"
+
+SELECTORS = {
+    "place_name": [
+        "h1.DUwDvf",
+        "div[role='main'] h1",
+    ],
+    "review_tab": [
+        "button[role='tab'][aria-label*='Bài đánh giá'], "
+        "button[role='tab'][aria-label*='Reviews']",
+    ],
+    "sort_button": [
+        "button[aria-label*='Phù hợp nhất'], "
+        "button[aria-label*='Most relevant']",
+        "button[data-value='Sắp xếp'], button[data-value='Sort']",
+    ],
+    "sort_lowest": [
+        "div[role='menuitemradio']:has-text('Xếp hạng thấp nhất'), "
+        "div[role='menuitemradio']:has-text('Lowest rating')",
+    ],
+    "sort_highest": [
+        "div[role='menuitemradio']:has-text('Xếp hạng cao nhất'), "
+        "div[role='menuitemradio']:has-text('Highest rating')",
+    ],
+    "scroll_box": [
+        "div.m6QErb.DxyBCb.kA9KIf.dS8AEf",
+        "div.m6QErb.DxyBCb",
+        "div[role='main'] div[tabindex='-1']",
+    ],
+    "review_block": [
+        "div.jftiEf",
+        "div[data-review-id][aria-label]",
+    ],
+    "translate_button": [
+        "button:has-text('Xem bản dịch'), "
+        "button:has-text('See translation')",
+    ],
+
+    # tương đối trong 1 review_block
+    "user": [
+        "div.d4r55",
+        "button[data-review-id] div:first-child",
+    ],
+    "rating": [
+        "span.kvMYJc",
+        "span[role='img'][aria-label*='sao'], span[role='img'][aria-label*='star']",
+    ],
+    "time": [
+        "span.rsqaWe",
+    ],
+    "text": [
+        "span.wiI7pd",
+        "div[id][lang] span",
+    ],
+}
+
+# JSON {"version": ..., "selectors": {key: [...]}} ghi đè registry mà không sửa code
+SELECTORS_FILE = "selectors.json"
+
+# key bắt buộc phải tìm thấy ở pre-flight, theo từng bước của scraper
+PAGE_KEYS = ["place_name", "review_tab"]
+PANEL_KEYS = ["sort_button", "scroll_box", "review_block"]
+BLOCK_KEYS = ["user", "rating", "time", "text"]
+
+# selector đã xác nhận chạy được ở pre-flight
+RESOLVED = {}
+
+
+def load_registry(path=SELECTORS_FILE):
+    global VERSION
+
+    if not os.path.exists(path):
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    VERSION = data.get("version", VERSION)
+
+    for key, candidates in data.get("selectors", {}).items():
+        SELECTORS[key] = list(candidates)
+
+    RESOLVED.clear()
+
+    print(f"🧩 Selector registry {VERSION} từ {path}")
+
+
+load_registry()
+
+
+# ======================
+# LOOKUP
+# ======================
+
+# chưa probe → gộp mọi fallback thành 1 selector "a, b, c"
+def css(key):
+    return RESOLVED.get(key) or ", ".join(SELECTORS[key])
+
+
+async def resolve(scope, key):
+
+    for sel in SELECTORS[key]:
+        try:
+            if await scope.locator(sel).count() > 0:
+                RESOLVED[key] = sel
+                return sel
+        except Exception:
+            continue
+
+    return None
+
+
+async def resolve_all(scope, keys):
+
+    missing = []
+
+    for key in keys:
+        if await resolve(scope, key) is None:
+            missing.append(key)
+
+    return missing
+
+
+# ======================
+# CIRCUIT BREAKER
+# ======================
+
+# K place liên tiếp lỗi cấu trúc (không thấy tên, có review mà không đọc được sao,...)
+# → layout đã đổi, dừng crawl thay vì chạy hết danh sách URL
+MAX_STRUCTURAL_FAILURES = 5
+
+
+class StructuralError(Exception):
+    pass
+
+
+def new_breaker(limit=MAX_STRUCTURAL_FAILURES):
+    return {"failures": 0, "limit": limit, "open": False}
+
+
+def record_success(breaker):
+    breaker["failures"] = 0
+
+
+def record_failure(breaker, reason):
+
+    breaker["failures"] += 1
+
+    print(f"🧱 Lỗi cấu trúc ({breaker['failures']}/{breaker['limit']}): {reason}")
+
+    if breaker["failures"] >= breaker["limit"]:
+        breaker["open"] = True
+        print(f"⛔ {breaker['limit']} place liên tiếp lỗi cấu trúc → dừng crawl, "
+              f"kiểm tra lại selector (registry {VERSION})")
+
+    return breaker["open"]
@@ -0,0 +1,196 @@
+import os
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+# ======================
+# CONFIG
+# ======================
+
+# tab mới sau bấy nhiêu task (1 URL / 1 batch label)
+PAGE_MAX_TASKS = 100
+
+# JS heap của tab (CDP Performance.getMetrics)
+MAX_HEAP_MB = 512
+
+# RSS của cả browser (mọi process con) → relaunch context, chỉ khi được phép
+MAX_RSS_MB = 4096
+
+# đo memory mỗi CHECK_EVERY task (getMetrics + quét process không miễn phí)
+CHECK_EVERY = 5
+
+
+# ======================
+# MEMORY
+# ======================
+
+async def page_heap_mb(lc):
+
+    if lc["cdp"] is None:
+        return None
+
+    try:
+        result = await lc["cdp"].send("Performance.getMetrics")
+    except Exception:
+        return None
+
+    metrics = {m["name"]: m["value"] for m in result["metrics"]}
+
+    return metrics.get("JSHeapUsedSize", 0) / 2**20
+
+
+# RSS chromium = tổng process con của process này (driver node + browser + renderer)
+def browser_rss_mb():
+
+    if psutil is not None:
+        total = 0
+
+        for child in psutil.Process().children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+
+        return total / 2**20
+
+    # không có psutil: Linux đọc /proc, hệ khác bỏ qua check RSS
+    if not os.path.isdir("/proc"):
+        return None
+
+    parents, rss = {}, {}
+
+    for pid in os.listdir("/proc"):
+
+        if not pid.isdigit():
+            continue
+
+        try:
+            with open(f"/proc/{pid}/status", "r") as f:
+                for line in f:
+                    if line.startswith("PPid:"):
+                        parents[int(pid)] = int(line.split()[1])
+                    elif line.startswith("VmRSS:"):
+                        rss[int(pid)] = int(line.split()[1]) * 1024
+        except OSError:
+            continue
+
+    me = os.getpid()
+    total = 0
+
+    for pid in rss:
+        p = parents.get(pid)
+        while p and p != me:
+            p = parents.get(p)
+        if p == me:
+            total += rss[pid]
+
+    return total / 2**20
+
+
+# ======================
+# LIFECYCLE
+# ======================
+
+# setup(page): chuẩn bị tab mới (vd mở ChatGPT)
+# relaunch(): mở lại context; profile persistent giữ cookie/login trên đĩa
+# nên context mới không cần đăng nhập lại. Không có relaunch (context
+# dùng chung giữa nhiều worker) → chỉ recycle tab
+def new_lifecycle(ctx, setup=None, relaunch=None, max_tasks=PAGE_MAX_TASKS,
+                  max_heap_mb=MAX_HEAP_MB, max_rss_mb=MAX_RSS_MB):
+    return {
+        "ctx": ctx,
+        "page": None,
+        "cdp": None,
+        "tasks": 0,
+        "setup": setup,
+        "relaunch": relaunch,
+        "max_tasks": max_tasks,
+        "max_heap_mb": max_heap_mb,
+        "max_rss_mb": max_rss_mb,
+    }
+
+
+async def current_page(lc):
+
+    if lc["page"] is not None and not lc["page"].is_closed():
+        return lc["page"]
+
+    page = await lc["ctx"].new_page()
+
+    try:
+        lc["cdp"] = await lc["ctx"].new_cdp_session(page)
+        await lc["cdp"].send("Performance.enable")
+    except Exception:
+        # không phải chromium → không đo heap được, vẫn recycle theo số task
+        lc["cdp"] = None
+
+    lc["page"] = page
+    lc["tasks"] = 0
+
+    if lc["setup"] is not None:
+        await lc["setup"](page)
+
+    return page
+
+
+async def recycle_page(lc, reason):
+
+    print(f"♻️ Recycle tab ({reason})")
+
+    await close_page(lc)
+
+
+async def recycle_context(lc, reason):
+
+    print(f"♻️ Relaunch browser ({reason})")
+
+    lc["page"], lc["cdp"] = None, None
+
+    await lc["ctx"].close()
+
+    lc["ctx"] = await lc["relaunch"]()
+
+
+# gọi sau mỗi task; tab/context mới được mở lười ở current_page
+async def task_done(lc):
+
+    lc["tasks"] += 1
+
+    if lc["tasks"] >= lc["max_tasks"]:
+        await recycle_page(lc, f"{lc['tasks']} task")
+        return
+
+    if lc["tasks"] % CHECK_EVERY != 0:
+        return
+
+    heap = await page_heap_mb(lc)
+    rss = browser_rss_mb()
+
+    print(
+        f"🧠 heap {'?' if heap is None else f'{heap:.0f}'}MB, "
+        f"browser rss {'?' if rss is None else f'{rss:.0f}'}MB"
+    )
+
+    if rss is not None and rss > lc["max_rss_mb"]:
+        if lc["relaunch"] is not None:
+            await recycle_context(lc, f"rss {rss:.0f}MB")
+        else:
+            await recycle_page(lc, f"rss {rss:.0f}MB")
+    elif heap is not None and heap > lc["max_heap_mb"]:
+        await recycle_page(lc, f"heap {heap:.0f}MB")
+
+
+# context dùng chung → chỉ đóng tab của mình
+async def close_page(lc):
+
+    page, lc["page"], lc["cdp"] = lc["page"], None, None
+
+    if page is not None and not page.is_closed():
+        await page.close()
+
+
+async def close(lc):
+    await lc["ctx"].close()
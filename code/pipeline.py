@@ -0,0 +1,420 @@
+import asyncio
+import glob
+import json
+import os
+import time
+from datetime import datetime
+
+import pandas as pd
+from playwright.async_api import async_playwright
+
+import data_aug_syn
+import get_urls
+import label_data
+import low_freq
+import maps_selectors
+import page_lifecycle
+import prelabel
+import preprocess
+import rate_limit
+import scraper
+import store
+
+
+# ======================
+# CONFIG
+# ======================
+
+PROFILE_DIR = "chrome_profile"
+
+STATE_FILE = "output/pipeline_state.json"
+
+# số worker mỗi stage (scrape / label = số tab trong cùng 1 browser)
+SCRAPE_WORKERS = 2
+LABEL_WORKERS = 1
+
+# queue có giới hạn → stage sau chậm thì stage trước tự chờ (backpressure)
+URL_QUEUE_SIZE = 50
+PLACE_QUEUE_SIZE = 10
+REVIEW_QUEUE_SIZE = 500
+
+# không có review mới trong khoảng này → gửi batch đang dở cho ChatGPT
+LABEL_IDLE_SECONDS = 20
+
+LABELED_PATTERN = os.path.join(label_data.OUTPUT_DIR, "labeled_pipeline_*.csv")
+
+# báo hiệu stage trước đã xong; object riêng để không lẫn với None ("không có gì")
+DONE = object()
+
+
+# ======================
+# STATE
+# ======================
+
+# queries_done: query đã search xong
+# urls: URL đã tìm thấy (theo thứ tự), urls_done: URL đã scrape xong
+# scrape_files: file CSV của scraper qua các lần chạy, để resume review chưa label
+def load_state(path=STATE_FILE):
+
+    state = {"queries_done": [], "urls": [], "urls_done": [], "scrape_files": []}
+
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            state.update(json.load(f))
+
+    return state
+
+
+def save_state(state, path=STATE_FILE):
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    tmp = path + ".tmp"
+
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+
+    os.replace(tmp, path)
+
+
+# review đã scrape ở lần chạy trước nhưng chưa kịp label
+def unlabeled_reviews(conn, scrape_files):
+
+    if not scrape_files:
+        return pd.DataFrame()
+
+    df = store.read_view(conn, "v_unlabeled")
+
+    return df[df["source_file"].isin(scrape_files)]
+
+
+# ======================
+# STAGES
+# ======================
+
+async def discover(ctx, queries, state, url_q):
+
+    page = await ctx.new_page()
+
+    try:
+        # URL tìm thấy lần trước nhưng chưa scrape → đi trước
+        for url in state["urls"]:
+            if url not in state["urls_done"]:
+                await url_q.put(url)
+
+        known = set(state["urls"])
+
+        for query in queries:
+
+            if query in state["queries_done"]:
+                continue
+
+            try:
+                urls = await rate_limit.retry_blocked(get_urls.search_google_maps, page, query)
+            except Exception as e:
+                print(f"❌ Search {query}: {e}")
+                continue
+
+            new_urls = [u.split("?")[0] for u in urls]
+            new_urls = [u for u in dict.fromkeys(new_urls) if u not in known]
+
+            known.update(new_urls)
+            state["urls"].extend(new_urls)
+            state["queries_done"].append(query)
+            save_state(state)
+
+            print(f"🆕 {query}: {len(new_urls)} URL mới")
+
+            for url in new_urls:
+                await url_q.put(url)
+
+    finally:
+        await page.close()
+        await url_q.put(DONE)
+
+
+async def scrape_worker(worker_no, ctx, state, conn, url_q, place_q, breaker, first_url=None):
+
+    lc = page_lifecycle.new_lifecycle(ctx)
+
+    while True:
+
+        if first_url is not None:
+            url, first_url = first_url, None
+        else:
+            url = await url_q.get()
+
+        if url is DONE:
+            await url_q.put(DONE)
+            break
+
+        # breaker mở → vẫn rút queue để discover không bị kẹt,
+        # URL chưa scrape vẫn nằm trong state cho lần chạy sau
+        if breaker["open"]:
+            continue
+
+        page = await page_lifecycle.current_page(lc)
+
+        try:
+            rows = await rate_limit.retry_blocked(scraper.run, page, url, conn)
+        except maps_selectors.StructuralError as e:
+            print(f"❌ [scrape {worker_no}] {url}: {e}")
+            maps_selectors.record_failure(breaker, e)
+            rows = None
+        except Exception as e:
+            print(f"❌ [scrape {worker_no}] {url}: {e}")
+            rows = None
+
+        await page_lifecycle.task_done(lc)
+
+        if rows is None:
+            continue
+
+        maps_selectors.record_success(breaker)
+
+        state["urls_done"].append(url)
+        save_state(state)
+
+        if rows:
+            await place_q.put(rows)
+
+    await page_lifecycle.close_page(lc)
+
+
+async def preprocess_stage(conn, place_q, review_q, seen_texts):
+
+    while True:
+
+        rows = await place_q.get()
+
+        if rows is DONE:
+            break
+
+        df = preprocess.preprocess_chunk(pd.DataFrame(rows)[scraper.FIELDS])
+
+        # review bị loại vẫn nằm trong store → đánh dấu để lần sau không replay
+        dropped = [r["text"] for i, r in enumerate(rows) if i not in df.index]
+
+        if dropped:
+            store.add_skipped(conn, dropped, "preprocess")
+
+        for _, row in df.iterrows():
+
+            text = str(row["text"]).strip()
+
+            # trùng review đã có / đang chờ label
+            if text in seen_texts:
+                continue
+
+            seen_texts.add(text)
+
+            await review_q.put(row)
+
+    await review_q.put(DONE)
+
+
+async def label_worker(worker_no, ctx, review_q, out_path, existing_texts, stats):
+
+    lc = page_lifecycle.new_lifecycle(
+        ctx, setup=label_data.reset_chatgpt, max_tasks=label_data.PAGE_MAX_TASKS
+    )
+
+    async def on_error(e, page):
+        # batch lỗi vẫn nằm trong v_unlabeled → lần chạy sau label lại
+        print(f"❌ [label {worker_no}] {e}")
+        await label_data.reset_chatgpt(page)
+
+    batcher = label_data.new_batcher(
+        lc, out_path, existing_texts, label_data.new_budget(), on_error=on_error
+    )
+
+    def note_first_label():
+        if batcher["batches"] and stats.get("first_label") is None:
+            stats["first_label"] = time.time() - stats["start"]
+            print(f"⏱️ Batch label đầu tiên sau {stats['first_label']:.0f}s")
+
+    while True:
+
+        try:
+            row = await asyncio.wait_for(review_q.get(), LABEL_IDLE_SECONDS)
+        except asyncio.TimeoutError:
+            # hàng đợi im lặng → label phần đang dở, khỏi chờ đủ batch
+            await label_data.flush_batch(batcher)
+            note_first_label()
+            continue
+
+        if row is DONE:
+            await review_q.put(DONE)
+            break
+
+        await label_data.add_review(batcher, row, str(row["text"]).strip())
+        note_first_label()
+
+    await label_data.flush_batch(batcher)
+    note_first_label()
+
+    await page_lifecycle.close_page(lc)
+
+
+# ======================
+# AUGMENT
+# ======================
+
+# knee + augmentation cần phân bố label của cả tập → chạy sau khi label xong
+def augment_labeled(out_path):
+
+    df = store.normalize_columns(pd.read_csv(out_path))
+
+    low, threshold = low_freq.select_low_frequency(df)
+    low.to_csv(low_freq.OUTPUT_CSV, index=False)
+
+    print(f"💾 {low_freq.OUTPUT_CSV}: {len(low)} rows (threshold {threshold})")
+
+    # pipeline lấy store làm nguồn chính → augmentation cũng ghi vào store
+    data_aug_syn.USE_STORE = True
+
+    aug = data_aug_syn.update_word_count(data_aug_syn.augment_dataset(df))
+
+    aug_path = out_path.replace(".csv", "_augmented.csv")
+    aug.to_csv(aug_path, index=False)
+
+    print(f"💾 {aug_path}: {len(aug)} rows")
+
+
+# ======================
+# MAIN
+# ======================
+
+async def run(queries, headless=False, profile_dir=PROFILE_DIR,
+              scrape_workers=SCRAPE_WORKERS, label_workers=LABEL_WORKERS, augment=False):
+
+    state = load_state()
+
+    scrape_file = os.path.basename(scraper.OUTPUT_FILE)
+    if scrape_file not in state["scrape_files"]:
+        state["scrape_files"].append(scrape_file)
+    save_state(state)
+
+    conn = store.connect()
+
+    os.makedirs(label_data.OUTPUT_DIR, exist_ok=True)
+
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    out_path = os.path.join(label_data.OUTPUT_DIR, f"labeled_pipeline_{ts}.csv")
+
+    existing_texts = set()
+    for path in glob.glob(LABELED_PATTERN):
+        existing_texts |= label_data.load_existing_texts(path)
+
+    seen_texts = set(existing_texts)
+
+    url_q = asyncio.Queue(URL_QUEUE_SIZE)
+    place_q = asyncio.Queue(PLACE_QUEUE_SIZE)
+    review_q = asyncio.Queue(REVIEW_QUEUE_SIZE)
+
+    stats = {"start": time.time()}
+
+    async with async_playwright() as p:
+
+        # maps + ChatGPT dùng chung 1 profile → 1 context, mỗi worker 1 tab
+        ctx = await p.chromium.launch_persistent_context(
+            user_data_dir=profile_dir,
+            headless=headless,
+            locale="vi-VN",
+            args=[
+                "--disable-blink-features=AutomationControlled",
+                "--lang=vi-VN",
+                "--start-maximized"
+            ]
+        )
+
+        async def scrape_stage():
+            # review scrape dở lần trước vào trước review mới
+            pending = unlabeled_reviews(conn, state["scrape_files"][:-1])
+
+            if not pending.empty:
+                print(f"♻️ {len(pending)} review chưa label từ lần chạy trước")
+
+                for _, group in pending.groupby("place_name", sort=False):
+                    await place_q.put(group.to_dict("records"))
+
+            breaker = maps_selectors.new_breaker()
+
+            # pre-flight selector trên URL đầu tiên, URL đó giao cho worker 0
+            first_url = await url_q.get()
+
+            # discover không có URL mới (vd resume sau lần chạy đã xong):
+            # trả sentinel lại cho các worker, bỏ pre-flight
+            if first_url is DONE:
+                await url_q.put(DONE)
+                first_url = None
+            else:
+                page = await ctx.new_page()
+
+                try:
+                    if await rate_limit.retry_blocked(scraper.preflight, page, first_url):
+                        breaker["open"] = True
+                except Exception as e:
+                    print(f"⚠️ Pre-flight lỗi: {e}")
+
+                await page.close()
+
+            await asyncio.gather(*(
+                scrape_worker(
+                    i, ctx, state, conn, url_q, place_q, breaker,
+                    first_url if i == 0 else None
+                )
+                for i in range(scrape_workers)
+            ))
+
+            await place_q.put(DONE)
+
+        await asyncio.gather(
+            discover(ctx, queries, state, url_q),
+            scrape_stage(),
+            preprocess_stage(conn, place_q, review_q, seen_texts),
+            *(
+                label_worker(i, ctx, review_q, out_path, existing_texts, stats)
+                for i in range(label_workers)
+            ),
+        )
+
+        await ctx.close()
+
+    print(f"\n✅ Pipeline xong sau {time.time() - stats['start']:.0f}s, "
+          f"{len(state['urls_done'])}/{len(state['urls'])} URL")
+
+    if augment and os.path.exists(out_path):
+        augment_labeled(out_path)
+
+
+# ======================
+# CLI
+# ======================
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", nargs="+", default=get_urls.QUERIES)
+    parser.add_argument("--headless", action="store_true")
+    parser.add_argument("--profile", default=PROFILE_DIR)
+    parser.add_argument("--scrape-workers", type=int, default=SCRAPE_WORKERS)
+    parser.add_argument("--label-workers", type=int, default=LABEL_WORKERS)
+    parser.add_argument("--augment", action="store_true")
+    parser.add_argument("--prelabel", action="store_true")
+    parser.add_argument("--capture-raw", action="store_true")
+
+    args = parser.parse_args()
+
+    if args.prelabel:
+        label_data.USE_PRELABEL = prelabel.agreement_ok()
+
+    if args.capture_raw:
+        scraper.CAPTURE_RAW = True
+
+    asyncio.run(run(
+        args.queries, args.headless, args.profile,
+        args.scrape_workers, args.label_workers, args.augment
+    ))
@@ -0,0 +1,339 @@
+import glob
+import os
+import re
+import unicodedata
+
+import pandas as pd
+
+
+# ======================
+# CONFIG
+# ======================
+
+LABELED_DIR = "output_labeled"
+
+LABEL_COLS = ["food", "service", "place", "price"]
+
+NONE, NEG, POS, NEUTRAL = 0, 1, 2, 3
+
+# review dài thường nhiều ý → để model xử lý
+MAX_WORDS = 20
+
+# tỉ lệ khớp đủ 4 aspect với label model trong lịch sử, dưới mức này
+# thì label_data / pipeline không bật prelabel (xem agreement_ok)
+MIN_AGREEMENT = 0.95
+
+
+# ======================
+# LEXICON
+# ======================
+
+# từ nhắc tới aspect (không mang cảm xúc)
+ASPECT_TERMS = {
+    "food": [
+        "đồ ăn", "món ăn", "thức ăn", "món", "đồ uống", "thức uống", "nước uống",
+        "khẩu vị", "hương vị", "vị", "nước dùng", "nước lèo", "nước chấm", "topping",
+        "thịt", "cơm", "phở", "bún", "lẩu", "hải sản", "ốc", "bánh", "trà sữa",
+        "cà phê", "cafe", "coffee", "chè", "gà", "bò", "heo", "cá", "tôm", "mì",
+        "miến", "rau", "sốt", "nước", "buffet", "pizza", "burger", "sushi",
+    ],
+    "service": [
+        "nhân viên", "phục vụ", "phụ vụ", "dịch vụ", "thái độ", "chủ quán", "bạn nhân viên",
+        "staff", "shipper", "ra món", "lên món", "order", "tiếp khách",
+    ],
+    "place": [
+        "không gian", "không khí", "view", "vệ sinh", "bàn ghế", "bàn", "ghế", "chỗ ngồi",
+        "nhà vệ sinh", "toilet", "wc", "chỗ để xe", "bãi xe", "chỗ đậu xe",
+        "máy lạnh", "điều hòa", "decor", "trang trí",
+    ],
+    "price": [
+        "giá", "giá cả", "giá tiền", "mức giá", "tiền", "khuyến mãi", "khuyến mại",
+        "voucher", "combo",
+    ],
+}
+
+# từ mang cảm xúc gắn chặt với 1 aspect
+ASPECT_POLAR = {
+    "food": {
+        POS: ["ngon", "tươi", "đậm đà", "vừa miệng", "vừa ăn", "mlem", "bắt vị"],
+        NEG: ["dở", "nhạt", "mặn chát", "ôi", "thiu", "tanh", "nguội", "khó ăn", "dai nhách"],
+    },
+    "service": {
+        POS: [
+            "nhiệt tình", "thân thiện", "chu đáo", "dễ thương", "lịch sự", "niềm nở",
+            "vui vẻ", "nhanh", "nhanh chóng",
+        ],
+        NEG: [
+            "cọc", "cọc cằn", "láo", "hỗn", "thô lỗ", "khó chịu", "lồi lõm", "chảnh",
+            "chậm",
+        ],
+    },
+    "place": {
+        POS: [
+            "thoáng", "thoáng mát", "mát mẻ", "mát", "rộng rãi", "gọn gàng", "ấm cúng", "đẹp", "yên tĩnh", "chill",
+        ],
+        NEG: ["bẩn", "dơ", "chật", "chật chội", "ồn", "ồn ào", "nóng nực", "xập xệ"],
+    },
+    "price": {
+        POS: ["rẻ", "hợp lý", "hợp lí", "phải chăng", "đáng tiền", "hạt dẻ"],
+        NEG: ["đắt", "mắc", "chặt chém", "chém", "không đáng tiền"],
+    },
+}
+
+# cảm xúc chung → gán cho aspect được nhắc trong cùng mệnh đề
+GENERIC_POLAR = {
+    POS: ["tốt", "tuyệt", "tuyệt vời", "xuất sắc", "đỉnh", "hài lòng"],
+    NEG: ["tệ", "kém", "tồi", "tồi tệ", "chán", "thất vọng"],
+}
+
+# từ mơ hồ → để model quyết định
+AMBIGUOUS_TERMS = [
+    "bình thường", "tạm", "tạm được", "tạm ổn", "ổn", "cũng được", "được", "hơi", "khá",
+    "không tệ", "không quá", "chưa", "nhưng", "tuy", "mà", "so với", "hơn", "như",
+    "nếu", "cần", "bình dân", "đáng", "ok", "oke", "oki", "okela", "ngán",
+    # "sạch" dùng cho cả đồ ăn lẫn quán
+    "sạch", "sạch sẽ", "nhung", "?",
+]
+
+# câu "đệm" không nhắc aspect nào, coi như đã hiểu
+FILLER_TERMS = [
+    "quay lại", "ủng hộ", "lần sau", "recommend", "nên thử", "đáng thử", "sẽ ghé",
+    "ghé lại", "10 điểm", "cảm ơn",
+]
+
+NEGATORS = ["không", "ko", "k", "chẳng", "chả", "hổng", "hông", "chưa", "đừng"]
+
+CLAUSE_SPLIT = re.compile(r"[,.;:!\n]+|\s+(?:và|với|còn)\s+")
+
+
+# ======================
+# COMPILED MATCHERS
+# ======================
+
+def compile_terms(terms):
+    # từ dài trước để "sạch sẽ" thắng "sạch"
+    alternation = "|".join(
+        re.escape(t) for t in sorted(set(terms), key=len, reverse=True)
+    )
+    return re.compile(rf"(?<!\w)(?:{alternation})(?!\w)")
+
+
+ASPECT_RE = {a: compile_terms(terms) for a, terms in ASPECT_TERMS.items()}
+
+ASPECT_POLAR_RE = {
+    (a, pol): compile_terms(terms)
+    for a, by_pol in ASPECT_POLAR.items()
+    for pol, terms in by_pol.items()
+}
+
+GENERIC_POLAR_RE = {pol: compile_terms(terms) for pol, terms in GENERIC_POLAR.items()}
+
+FILLER_RE = compile_terms(FILLER_TERMS)
+
+AMBIGUOUS_RE = re.compile(
+    "|".join(
+        re.escape(t) if not t[0].isalpha() else rf"(?<!\w){re.escape(t)}(?!\w)"
+        for t in AMBIGUOUS_TERMS
+    )
+)
+
+# "không gian", "không khí" không phải phủ định
+NEGATOR_RE = re.compile(
+    rf"(?<!\w)(?:{'|'.join(NEGATORS)})(?!\s+(?:gian|khí)(?!\w))(?:\s+\w+)?\s*$"
+)
+
+DIGIT_RE = re.compile(r"\d")
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFC", str(text)).lower()
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def is_negated(clause, start):
+    # phủ định trong 2 từ phía trước
+    return NEGATOR_RE.search(clause[:start]) is not None
+
+
+def polar_hits(regex, clause, polarity):
+    hits = []
+
+    for m in regex.finditer(clause):
+        pol = polarity
+
+        if is_negated(clause, m.start()):
+            pol = NEG if polarity == POS else POS
+
+        hits.append(pol)
+
+    return hits
+
+
+# ======================
+# PRE-LABEL
+# ======================
+
+# trả về dict label nếu đủ chắc, None → gửi model
+def prelabel(text):
+
+    text = normalize(text)
+
+    if not text or len(text.split()) > MAX_WORDS:
+        return None
+
+    # số thường là giá / số lượng → model
+    if AMBIGUOUS_RE.search(text) or DIGIT_RE.search(text):
+        return None
+
+    found = {a: set() for a in LABEL_COLS}
+
+    for clause in CLAUSE_SPLIT.split(text):
+
+        clause = clause.strip()
+
+        if not clause:
+            continue
+
+        mentioned = {a for a in LABEL_COLS if ASPECT_RE[a].search(clause)}
+
+        clause_found = {a: set() for a in LABEL_COLS}
+
+        for (aspect, polarity), regex in ASPECT_POLAR_RE.items():
+            for pol in polar_hits(regex, clause, polarity):
+                clause_found[aspect].add(pol)
+
+        generic = []
+        for polarity, regex in GENERIC_POLAR_RE.items():
+            generic += polar_hits(regex, clause, polarity)
+
+        if generic:
+            targets = mentioned - {a for a in LABEL_COLS if clause_found[a]}
+
+            if len(targets) > 1:
+                return None
+
+            # câu chung chung không aspect → bỏ qua (aspect = 0)
+            for a in targets:
+                clause_found[a].update(generic)
+
+        for a in mentioned:
+            # nhắc aspect nhưng không rõ cảm xúc → model
+            if not clause_found[a]:
+                return None
+
+        hit = mentioned or generic or any(clause_found.values())
+
+        # mệnh đề không khớp lexicon nào → không đủ chắc
+        if not hit and not FILLER_RE.search(clause):
+            return None
+
+        for a in LABEL_COLS:
+            found[a] |= clause_found[a]
+
+    labels = {}
+
+    for a in LABEL_COLS:
+        if len(found[a]) > 1:
+            # mixed → model quyết định neutral hay không
+            return None
+        labels[a] = found[a].pop() if found[a] else NONE
+
+    return labels
+
+
+def prelabel_series(texts):
+    return [prelabel(t) for t in texts]
+
+
+# ======================
+# EVALUATION
+# ======================
+
+def load_history(labeled_dir=LABELED_DIR):
+
+    files = glob.glob(os.path.join(labeled_dir, "**", "*.csv"), recursive=True)
+
+    all_data = []
+
+    for file_path in files:
+        try:
+            df = pd.read_csv(file_path)
+        except Exception as e:
+            print(f"❌ Lỗi {file_path}: {e}")
+            continue
+
+        # file cũ dùng "cost" thay vì "price"
+        df = df.rename(columns={"cost": "price"})
+
+        if "text" not in df.columns or not set(LABEL_COLS) <= set(df.columns):
+            continue
+
+        all_data.append(df[["text"] + LABEL_COLS])
+
+    if not all_data:
+        return pd.DataFrame(columns=["text"] + LABEL_COLS)
+
+    df = pd.concat(all_data, ignore_index=True)
+    df = df.dropna(subset=["text"])
+    df = df[df[LABEL_COLS].isin([0, 1, 2, 3]).all(axis=1)]
+
+    return df.drop_duplicates(subset=["text"])
+
+
+# trả về tỉ lệ khớp 4 aspect trên phần auto-label (None nếu không có)
+def evaluate(df):
+
+    preds = prelabel_series(df["text"])
+
+    covered = [p is not None for p in preds]
+
+    df = df[covered]
+    pred_df = pd.DataFrame([p for p in preds if p is not None], index=df.index)
+
+    total = len(covered)
+    n = len(df)
+
+    print(f"Tổng review: {total}")
+    print(f"Auto-label:  {n} ({n / max(total, 1):.1%})")
+
+    if n == 0:
+        return None
+
+    exact = (pred_df[LABEL_COLS] == df[LABEL_COLS].astype(int)).all(axis=1)
+
+    print(f"Khớp 4 aspect: {exact.mean():.1%}")
+
+    for a in LABEL_COLS:
+        agree = (pred_df[a] == df[a].astype(int)).mean()
+        print(f"  {a:8s} {agree:.1%}")
+
+    return exact.mean()
+
+
+def agreement_ok(labeled_dir=LABELED_DIR, min_agreement=MIN_AGREEMENT):
+
+    exact = evaluate(load_history(labeled_dir))
+
+    if exact is None or exact < min_agreement:
+        print(f"⚠️ Prelabel khớp {0 if exact is None else exact:.1%} < {min_agreement:.0%} → tắt")
+        return False
+
+    print(f"✅ Prelabel khớp {exact:.1%} → bật")
+
+    return True
+
+
+# ======================
+# CLI
+# ======================
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dir", default=LABELED_DIR)
+
+    args = parser.parse_args()
+
+    evaluate(load_history(args.dir))
@@ -0,0 +1,148 @@
+import os
+import re
+import shutil
+import tempfile
+
+import pandas as pd
+
+import features
+
+
+# ======================
+# CONFIG
+# ======================
+
+INPUT_FILE = "output/clean_google_maps_reviews.csv"
+OUTPUT_FILE = "output/preprocessed_filtered_reviews_sorted.csv"
+
+CHUNK_SIZE = 50000
+
+MIN_WORDS = 5
+MAX_WORDS = 50
+
+URL_RE = re.compile(r"http\S+|www\S+")
+SPECIAL_RE = re.compile(r"[^\w\s]")
+DIGIT_RE = re.compile(r"\d+")
+SPACE_RE = re.compile(r"\s+")
+
+
+# ======================
+# TRANSFORM
+# ======================
+
+def clean_text_series(texts):
+
+    return (
+        texts.astype(str)
+        .str.lower()
+        .str.replace(URL_RE, "", regex=True)
+        .str.replace(SPECIAL_RE, " ", regex=True)
+        .str.replace(DIGIT_RE, "", regex=True)
+        .str.replace(SPACE_RE, " ", regex=True)
+        .str.strip()
+    )
+
+
+def preprocess_chunk(df, min_words=MIN_WORDS, max_words=MAX_WORDS):
+
+    df = df.copy()
+
+    df["rating"] = features.rating_number(df["rating"])
+
+    # bỏ rating lỗi/null
+    df = df.dropna(subset=["rating"])
+
+    df["clean_text"] = clean_text_series(df["text"])
+
+    df["word_count"] = features.word_count(df["clean_text"])
+
+    return df[
+        (df["word_count"] >= min_words) &
+        (df["word_count"] <= max_words)
+    ]
+
+
+# ======================
+# STREAMING PIPELINE
+# ======================
+
+# sắp xếp theo rating mà không giữ cả file trong RAM:
+# mỗi rating 1 file tạm, cuối cùng nối theo thứ tự rating tăng dần
+def preprocess_file(input_csv=INPUT_FILE, output_csv=OUTPUT_FILE, chunk_size=CHUNK_SIZE,
+                    min_words=MIN_WORDS, max_words=MAX_WORDS):
+
+    bucket_dir = tempfile.mkdtemp(
+        prefix="preprocess_",
+        dir=os.path.dirname(os.path.abspath(output_csv))
+    )
+
+    buckets = {}
+    total = kept = 0
+
+    try:
+        for chunk in pd.read_csv(input_csv, chunksize=chunk_size):
+
+            total += len(chunk)
+
+            out = preprocess_chunk(chunk, min_words, max_words)
+
+            kept += len(out)
+
+            for rating, part in out.groupby("rating", sort=False):
+
+                path = buckets.setdefault(
+                    rating,
+                    os.path.join(bucket_dir, f"rating_{rating:g}.csv")
+                )
+
+                part.to_csv(
+                    path,
+                    mode="a",
+                    header=not os.path.exists(path),
+                    index=False
+                )
+
+            print(f"📦 {total} rows → {kept} kept")
+
+        with open(output_csv, "w", encoding="utf-8", newline="") as out:
+
+            for i, rating in enumerate(sorted(buckets)):
+
+                with open(buckets[rating], "r", encoding="utf-8", newline="") as f:
+
+                    header = f.readline()
+
+                    if i == 0:
+                        out.write(header)
+
+                    shutil.copyfileobj(f, out)
+
+    finally:
+        shutil.rmtree(bucket_dir, ignore_errors=True)
+
+    print(f"Tổng review ban đầu: {total}")
+    print(f"Sau filtering: {kept}")
+    print(f"\n✅ Đã lưu: {output_csv}")
+
+
+# ======================
+# CLI
+# ======================
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", "-i", default=INPUT_FILE)
+    parser.add_argument("--output", "-o", default=OUTPUT_FILE)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--min-words", type=int, default=MIN_WORDS)
+    parser.add_argument("--max-words", type=int, default=MAX_WORDS)
+
+    args = parser.parse_args()
+
+    preprocess_file(
+        args.input, args.output, args.chunk_size,
+        args.min_words, args.max_words
+    )
@@ -0,0 +1,254 @@
+import asyncio
+import json
+import os
+import time
+
+
+# ======================
+# CONFIG
+# ======================
+
+# token bucket: request/giây cho mọi page.goto tới Google Maps
+START_RATE = 0.2
+MIN_RATE = 0.02
+MAX_RATE = 1.0
+BURST = 2
+
+# AIMD: thành công → +RATE_STEP, bị chặn → x BACKOFF
+RATE_STEP = 0.01
+BACKOFF = 0.5
+
+# bị chặn → mọi worker nghỉ chung, nhân đôi nếu bị chặn liên tiếp
+COOLDOWN = 60
+MAX_COOLDOWN = 900
+
+# số lần thử lại 1 URL bị chặn (mỗi lần chờ hết cooldown chung)
+MAX_BLOCK_RETRY = 3
+
+# probe ngay sau goto, rẻ hơn nhiều so với chờ selector timeout 60s
+BLOCK_PROBE_JS = """
+() => {
+    const url = location.href;
+
+    if (url.includes("/sorry/")) return "sorry";
+    if (url.includes("consent.google.")) return "consent";
+
+    if (document.querySelector("form#captcha-form, iframe[src*='recaptcha'], div#recaptcha")) {
+        return "captcha";
+    }
+
+    const body = (document.body && document.body.innerText || "").slice(0, 5000).toLowerCase();
+
+    if (body.includes("unusual traffic") || body.includes("lưu lượng truy cập bất thường")) {
+        return "unusual traffic";
+    }
+
+    return null;
+}
+"""
+
+CONSENT_BUTTONS = (
+    "button:has-text('Chấp nhận tất cả'), "
+    "button:has-text('Accept all')"
+)
+
+
+class BlockedError(Exception):
+    pass
+
+
+# ======================
+# TOKEN BUCKET + AIMD
+# ======================
+
+def new_limiter():
+    return {
+        "rate": START_RATE,
+        "min_rate": MIN_RATE,
+        "max_rate": MAX_RATE,
+        "tokens": BURST,
+        "updated": time.monotonic(),
+        "blocked_until": 0.0,
+        "cooldown": COOLDOWN,
+        # file chung giữa các process (xem share_limiter), None = chỉ trong process
+        "shared_file": None,
+        "seen_block": 0.0,
+        "lock": asyncio.Lock(),
+    }
+
+
+# 1 limiter cho cả process → scraper, get_urls và mọi worker trong pipeline dùng chung
+LIMITER = new_limiter()
+
+
+# nhiều process cùng crawl: chia rate cho n_processes để tổng không đổi,
+# trạng thái bị chặn ghi vào shared_file → 1 process bị chặn thì cả nhóm nghỉ.
+# sửa limiter tại chỗ, không đụng START_RATE/MIN_RATE/MAX_RATE của module
+def share_limiter(limiter, n_processes, shared_file):
+    # process trong pool có thể được dùng lại → bắt đầu từ limiter mới
+    limiter.update(new_limiter())
+    limiter["rate"] = START_RATE / n_processes
+    limiter["min_rate"] = MIN_RATE / n_processes
+    limiter["max_rate"] = MAX_RATE / n_processes
+    limiter["shared_file"] = shared_file
+
+
+# ======================
+# SHARED BLOCK STATE
+# ======================
+
+# giờ hệ thống (time.time), không phải monotonic: so sánh được giữa các process
+def read_shared_block(limiter):
+
+    path = limiter["shared_file"]
+
+    if path is None or not os.path.exists(path):
+        return 0.0
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return float(json.load(f)["blocked_until"])
+    except (OSError, ValueError, KeyError):
+        # process khác đang ghi dở → lần acquire sau đọc lại
+        return 0.0
+
+
+def write_shared_block(limiter, blocked_until, reason):
+
+    path = limiter["shared_file"]
+    tmp = f"{path}.{os.getpid()}.tmp"
+
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"blocked_until": blocked_until, "reason": reason, "pid": os.getpid()}, f)
+
+    os.replace(tmp, path)
+
+
+# process khác vừa bị chặn → nghỉ tới cùng thời điểm và giảm rate 1 lần
+def sync_shared_block(limiter):
+
+    blocked_until = read_shared_block(limiter)
+
+    if blocked_until <= limiter["seen_block"]:
+        return
+
+    limiter["seen_block"] = blocked_until
+
+    wait = blocked_until - time.time()
+
+    if wait <= 0:
+        return
+
+    limiter["rate"] = max(limiter["min_rate"], limiter["rate"] * BACKOFF)
+    limiter["tokens"] = 0
+    limiter["blocked_until"] = max(limiter["blocked_until"], time.monotonic() + wait)
+
+    print(f"🚫 Process khác bị chặn → nghỉ chung {wait:.0f}s, rate {limiter['rate']:.3f} req/s")
+
+
+def refill(limiter, now):
+    elapsed = now - limiter["updated"]
+
+    limiter["tokens"] = min(BURST, limiter["tokens"] + elapsed * limiter["rate"])
+    limiter["updated"] = now
+
+
+async def acquire(limiter=LIMITER):
+
+    async with limiter["lock"]:
+
+        while True:
+
+            sync_shared_block(limiter)
+
+            now = time.monotonic()
+
+            if now < limiter["blocked_until"]:
+                await asyncio.sleep(limiter["blocked_until"] - now)
+                continue
+
+            refill(limiter, now)
+
+            if limiter["tokens"] >= 1:
+                limiter["tokens"] -= 1
+                return
+
+            await asyncio.sleep((1 - limiter["tokens"]) / limiter["rate"])
+
+
+def on_success(limiter=LIMITER):
+    limiter["rate"] = min(limiter["max_rate"], limiter["rate"] + RATE_STEP)
+    limiter["cooldown"] = COOLDOWN
+
+
+def on_block(limiter=LIMITER, reason=""):
+
+    # process khác đã báo chặn đợt này → nhận cooldown của nó
+    sync_shared_block(limiter)
+
+    now = time.monotonic()
+
+    # worker khác cũng vừa báo chặn trong cùng đợt → không phạt 2 lần
+    if now < limiter["blocked_until"]:
+        return
+
+    limiter["rate"] = max(limiter["min_rate"], limiter["rate"] * BACKOFF)
+    limiter["tokens"] = 0
+    limiter["blocked_until"] = now + limiter["cooldown"]
+
+    if limiter["shared_file"] is not None:
+        limiter["seen_block"] = time.time() + limiter["cooldown"]
+        write_shared_block(limiter, limiter["seen_block"], reason)
+
+    print(
+        f"🚫 Bị chặn ({reason}) → nghỉ {limiter['cooldown']}s, "
+        f"rate {limiter['rate']:.3f} req/s"
+    )
+
+    limiter["cooldown"] = min(MAX_COOLDOWN, limiter["cooldown"] * 2)
+
+
+# ======================
+# GOTO
+# ======================
+
+async def probe_block(page):
+
+    reason = await page.evaluate(BLOCK_PROBE_JS)
+
+    # trang consent thường bấm qua được, không tính là bị chặn
+    if reason == "consent":
+        button = page.locator(CONSENT_BUTTONS).first
+
+        if await button.count() > 0:
+            await button.click()
+            await page.wait_for_load_state()
+            reason = await page.evaluate(BLOCK_PROBE_JS)
+
+    return reason
+
+
+async def goto(page, url, limiter=LIMITER, **kwargs):
+
+    await acquire(limiter)
+
+    await page.goto(url, **kwargs)
+
+    reason = await probe_block(page)
+
+    if reason:
+        on_block(limiter, reason)
+        raise BlockedError(f"{reason}: {url}")
+
+    on_success(limiter)
+
+
+async def retry_blocked(fn, *args, retries=MAX_BLOCK_RETRY):
+
+    for attempt in range(1, retries + 1):
+        try:
+            return await fn(*args)
+        except BlockedError as e:
+            print(f"⚠️ {e} (lần {attempt}/{retries})")
+
+    raise BlockedError(f"vẫn bị chặn sau {retries} lần")
@@ -0,0 +1,267 @@
+import csv
+import gzip
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bs4 import BeautifulSoup
+
+import crawl_policy
+import maps_selectors
+
+
+# ======================
+# CONFIG
+# ======================
+
+RAW_DIR = "output/raw"
+
+OBJECTS_DIR = os.path.join(RAW_DIR, "objects")
+INDEX_FILE = os.path.join(RAW_DIR, "index.jsonl")
+
+OUTPUT_FILE = "output/reextracted_reviews.csv"
+
+WORKERS = os.cpu_count() or 1
+
+
+# ======================
+# WRITE
+# ======================
+
+# object = HTML panel review đã nén, tên file = sha256 nội dung
+# → chụp lại y hệt lần trước thì không tốn thêm chỗ
+def object_path(digest):
+    return os.path.join(OBJECTS_DIR, digest[:2], digest + ".html.gz")
+
+
+def put_object(html):
+
+    data = html.encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()
+
+    path = object_path(digest)
+
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp = path + f".{os.getpid()}.tmp"
+
+        with gzip.open(tmp, "wb", compresslevel=6) as f:
+            f.write(data)
+
+        os.replace(tmp, path)
+
+    return digest
+
+
+def get_object(digest):
+    with gzip.open(object_path(digest), "rb") as f:
+        return f.read().decode("utf-8")
+
+
+# 1 dòng index / lần scrape 1 place: (place_url, scraped_at) → object
+def save_capture(place_url, place_name, html):
+
+    digest = put_object(html)
+
+    entry = {
+        "place_url": place_url,
+        "place_name": place_name,
+        "scraped_at": time.time(),
+        "sha256": digest,
+        "selectors": maps_selectors.VERSION,
+    }
+
+    os.makedirs(RAW_DIR, exist_ok=True)
+
+    with open(INDEX_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    return digest
+
+
+def load_index(path=INDEX_FILE):
+
+    if not os.path.exists(path):
+        return []
+
+    entries = []
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                # dòng cuối ghi dở khi process chết
+                continue
+
+    return entries
+
+
+# mỗi place chỉ giữ lần scrape mới nhất
+def latest_captures(entries):
+
+    latest = {}
+
+    for e in entries:
+        old = latest.get(e["place_url"])
+        if old is None or e["scraped_at"] > old["scraped_at"]:
+            latest[e["place_url"]] = e
+
+    return list(latest.values())
+
+
+# ======================
+# RE-EXTRACT
+# ======================
+
+def select_first(scope, key):
+
+    for sel in maps_selectors.SELECTORS[key]:
+        found = scope.select(sel)
+        if found:
+            return found
+
+    return []
+
+
+# parse lại HTML đã lưu bằng đúng luật lọc của scraper.review_row
+# và crawl policy hiện tại của place (cửa sổ sao, quota)
+def extract_reviews(entry):
+
+    # import muộn: scraper cũng import raw_store
+    import scraper
+
+    soup = BeautifulSoup(get_object(entry["sha256"]), "lxml")
+
+    # inner_text() của playwright đổi <br> thành xuống dòng, get_text() thì không
+    for br in soup.find_all("br"):
+        br.replace_with("\n")
+
+    policy = crawl_policy.policy_for(entry["place_url"], entry["place_name"])
+    sort = crawl_policy.choose_sort(policy)
+    tally = crawl_policy.new_tally()
+
+    rows = []
+
+    for block in select_first(soup, "review_block"):
+
+        user = select_first(block, "user")
+        rating = select_first(block, "rating")
+        time_ = select_first(block, "time")
+        text = select_first(block, "text")
+
+        rating = rating[0].get("aria-label", "") if rating else ""
+        text = text[0].get_text() if text else ""
+
+        decision = crawl_policy.classify(
+            policy, tally, sort, crawl_policy.parse_rating(rating), text
+        )
+
+        if decision == crawl_policy.STOP:
+            break
+
+        if decision == crawl_policy.SKIP:
+            continue
+
+        row = scraper.review_row(
+            entry["place_name"],
+            user[0].get_text() if user else "",
+            rating,
+            time_[0].get_text() if time_ else "",
+            text,
+        )
+
+        if row is not None:
+            rows.append(row)
+
+    return rows
+
+
+def extract_chunk(entries):
+
+    rows = []
+
+    for entry in entries:
+        try:
+            rows.extend(extract_reviews(entry))
+        except Exception as e:
+            print(f"❌ {entry['place_url']}: {e}")
+
+    return rows
+
+
+# re-extract toàn bộ store, không cần browser; mỗi worker 1 nhóm place
+def reextract(output_csv=OUTPUT_FILE, workers=WORKERS, since=None, all_captures=False):
+
+    import scraper
+
+    entries = load_index()
+
+    if since is not None:
+        entries = [e for e in entries if e["scraped_at"] >= since]
+
+    if not all_captures:
+        entries = latest_captures(entries)
+
+    chunks = [entries[i::workers * 4] for i in range(workers * 4)]
+    chunks = [c for c in chunks if c]
+
+    total = 0
+
+    with open(output_csv, "w", newline="", encoding="utf-8-sig") as f:
+
+        writer = csv.DictWriter(f, fieldnames=scraper.FIELDS)
+        writer.writeheader()
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for rows in pool.map(extract_chunk, chunks):
+                writer.writerows(rows)
+                total += len(rows)
+
+    print(f"💾 {output_csv}: {total} reviews từ {len(entries)} capture")
+
+
+def store_stats():
+
+    entries = load_index()
+
+    n_objects = size = 0
+
+    for root, _, files in os.walk(OBJECTS_DIR):
+        for name in files:
+            n_objects += 1
+            size += os.path.getsize(os.path.join(root, name))
+
+    print(f"Capture:  {len(entries)} ({len(latest_captures(entries))} place)")
+    print(f"Object:   {n_objects}, {size / 2**20:.1f} MB nén")
+
+
+# ======================
+# CLI
+# ======================
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser()
+
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ext = sub.add_parser("extract")
+    ext.add_argument("--output", "-o", default=OUTPUT_FILE)
+    ext.add_argument("--workers", type=int, default=WORKERS)
+    ext.add_argument("--since", type=float, help="unix time, chỉ capture từ lúc này")
+    ext.add_argument("--all", action="store_true", help="mọi lần scrape, không chỉ bản mới nhất")
+
+    sub.add_parser("stats")
+
+    args = parser.parse_args()
+
+    if args.command == "extract":
+        reextract(args.output, args.workers, args.since, args.all)
+    else:
+        store_stats()
@@ -4,22 +4,30 @@ import os
 from datetime import datetime
 from playwright.async_api import async_playwright
 
+import crawl_policy
+import maps_selectors
+import page_lifecycle
+import rate_limit
+import raw_store
+import store
+from maps_selectors import StructuralError, css
+
 # =========================
 # CONFIG
 # =========================
 
-URLS = open("urls.txt", encoding="utf-8").read().splitlines()
-N = int(URLS[0])
-
-URLS = URLS[1:]
-UNSCRAPED_URLS = URLS[N:]
+URLS_FILE = "urls.txt"
 
 PROFILE_DIR = "chrome_profile"
 OUTPUT_DIR = "output"
 
-MAX_REVIEWS = 0
 SCROLL_DELAY = 1000
 
+# lấy bao nhiêu review, sao nào / place: xem crawl_policy.py
+
+# layout đúng thì tên place hiện trong vài giây
+PLACE_TIMEOUT = 30000
+
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 TIMESTAMP = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -31,6 +39,45 @@ OUTPUT_FILE = os.path.join(
 
 FIELDS = ["place_name", "user", "rating", "time", "text"]
 
+LAUNCH_ARGS = [
+    "--disable-blink-features=AutomationControlled",
+    "--lang=vi-VN",
+    "--start-maximized"
+]
+
+# ghi song song vào SQLite store (xem store.py)
+USE_STORE = True
+
+# lưu HTML panel review đã nén để re-extract offline (xem raw_store.py).
+# tốn đĩa (vài trăm KB / place) → chỉ bật khi cần, qua --capture-raw
+CAPTURE_RAW = False
+
+
+# dòng đầu urls.txt = số URL đã scrape xong
+def load_urls(path=URLS_FILE):
+
+    lines = open(path, encoding="utf-8").read().splitlines()
+
+    return int(lines[0]), lines[1:]
+
+
+# luật lọc 1 review, dùng chung cho scrape live và raw_store re-extract
+def review_row(place_name, user, rating, time, text):
+
+    clean_text = text.strip()
+
+    # bỏ review rỗng / quá ngắn
+    if len(clean_text) < 5:
+        return None
+
+    return {
+        "place_name": place_name,
+        "user": user,
+        "rating": rating,
+        "time": time,
+        "text": clean_text,
+    }
+
 
 def force_vietnamese(url: str):
     if "hl=" in url:
@@ -38,145 +85,152 @@ def force_vietnamese(url: str):
     return url + ("&hl=vi" if "?" in url else "?hl=vi")
 
 
-async def run(page, url):
+async def run(page, url, conn=None):
 
     # =========================
     # FORCE VI LANGUAGE
     # =========================
     url = force_vietnamese(url)
 
-    await page.goto(url, timeout=60000)
+    await rate_limit.goto(page, url, timeout=60000)
 
     # =========================
     # PLACE NAME
     # =========================
-    await page.wait_for_selector("h1.DUwDvf", timeout=60000)
+    try:
+        await page.wait_for_selector(css("place_name"), timeout=PLACE_TIMEOUT)
+    except Exception:
+        raise StructuralError(f"không thấy place_name: {url}")
 
-    place_name = await page.locator("h1.DUwDvf").inner_text()
+    place_name = await page.locator(css("place_name")).first.inner_text()
 
     print(f"\n📍 {place_name}")
 
     # =========================
     # OPEN REVIEW PANEL
     # =========================
-    review_btn = page.locator(
-    "button[role='tab'][aria-label*='Bài đánh giá'], "
-    "button[role='tab'][aria-label*='Reviews']"
-    ).first
+    # place chưa có đánh giá: không có tab / panel rỗng → xong với 0 review,
+    # không tính là lỗi cấu trúc (selector đã được pre-flight kiểm tra)
+    review_btn = page.locator(css("review_tab")).first
 
-    if await review_btn.count() > 0:
-        await review_btn.click()
-        await page.wait_for_timeout(3000)
-    else:
-        print("⚠️ Không có nút đánh giá, bỏ qua")
-        return
+    if await review_btn.count() == 0:
+        print(f"⏭️ {place_name}: không có tab đánh giá → 0 review")
+        return []
+
+    await review_btn.click()
+    await page.wait_for_timeout(3000)
+
+    if await page.locator(css("review_block")).count() == 0:
+        print(f"⏭️ {place_name}: chưa có review → 0 review")
+        return []
 
     # =========================
-    # SORT BY LOWEST RATING
+    # SORT THEO CRAWL POLICY
     # =========================
+    policy = crawl_policy.policy_for(url, place_name)
+    sort = crawl_policy.choose_sort(policy)
+
+    print(f"🎯 {crawl_policy.describe(policy)}, sort: {sort or 'mặc định'}")
 
-    # mở dropdown sort
-    sort_btn = page.locator(
-        "button[aria-label*='Phù hợp nhất'], "
-        "button[aria-label*='Most relevant']"
-    ).first
+    if sort is not None:
 
-    await sort_btn.click()
+        # mở dropdown sort
+        sort_btn = page.locator(css("sort_button")).first
 
-    await page.wait_for_timeout(1500)
+        await sort_btn.click()
 
-    # chọn "Xếp hạng thấp nhất"
-    lowest_btn = page.locator(
-        "div[role='menuitemradio']:has-text('Xếp hạng thấp nhất'), "
-        "div[role='menuitemradio']:has-text('Lowest rating')"
-    ).first
+        await page.wait_for_timeout(1500)
 
-    await lowest_btn.click()
+        # "Xếp hạng thấp nhất" / "Xếp hạng cao nhất"
+        await page.locator(css(f"sort_{sort}")).first.click()
+
+        await page.wait_for_timeout(2000)
 
-    await page.wait_for_timeout(2000)
     # =========================
     # SCROLL REVIEWS
-    # DỪNG KHI GẶP REVIEW 5 SAO
-    # HOẶC REVIEW RỖNG
+    # DỪNG KHI RA KHỎI CỬA SỔ SAO,
+    # ĐỦ QUOTA HOẶC GẶP REVIEW RỖNG
     # =========================
 
-    scroll_box = page.locator(
-        "div.m6QErb.DxyBCb.kA9KIf.dS8AEf"
-    ).first
+    scroll_box = page.locator(css("scroll_box")).first
+
+    tally = crawl_policy.new_tally()
+
+    # index các review_block sẽ lưu, theo thứ tự load
+    keep = []
+    checked = 0
+
+    # review nào cũng có sao → không thấy sao nào = selector rating hỏng;
+    # tương tự cho text khi đã load vài review
+    seen_rating = seen_text = False
 
     previous_count = 0
     same_count_times = 0
     max_same_count = 3
 
-    stop_on_5_star = False
-    stop_on_empty = False
+    stop = False
 
     while True:
 
-        review_blocks = page.locator("div.jftiEf")
+        review_blocks = page.locator(css("review_block"))
         current_count = await review_blocks.count()
 
-        print(f"📦 {current_count} reviews")
+        print(f"📦 {current_count} reviews, giữ {len(keep)}")
 
         # =========================
-        # CHECK LAST LOADED REVIEWS
+        # CHECK NEW LOADED REVIEWS
         # =========================
 
-        start_idx = max(previous_count - 5, 0)
-
-        for i in range(start_idx, current_count):
+        for i in range(checked, current_count):
 
             block = review_blocks.nth(i)
 
             try:
                 rating_text = await block.locator(
-                    "span.kvMYJc"
-                ).get_attribute("aria-label")
-
-                # ví dụ:
-                # "5 sao"
-                # "5 stars"
+                    css("rating")
+                ).first.get_attribute("aria-label", timeout=2000)
+            except:
+                rating_text = None
 
-                if rating_text and ("5" in rating_text):
-                    print("🛑 Gặp review 5 sao -> dừng scroll")
-                    stop_on_5_star = True
-                    break
+            text = ""
 
+            try:
+                if await block.locator(css("text")).count() > 0:
+                    text = await block.locator(
+                        css("text")
+                    ).first.inner_text()
             except:
                 pass
 
-            # =========================
-            # CHECK EMPTY REVIEW
-            # =========================
+            checked = i + 1
 
-            try:
-                text = ""
+            if rating_text:
+                seen_rating = True
 
-                if await block.locator("span.wiI7pd").count() > 0:
-                    text = await block.locator(
-                        "span.wiI7pd"
-                    ).inner_text()
+            if text.strip():
+                seen_text = True
 
-                clean_text = text.strip()
+            decision = crawl_policy.classify(
+                policy, tally, sort, crawl_policy.parse_rating(rating_text), text
+            )
 
-                # review rỗng / quá ngắn
-                if len(clean_text) < 5:
+            if decision == crawl_policy.STOP:
+                if len(text.strip()) < crawl_policy.MIN_TEXT_LEN:
                     print("🛑 Gặp review rỗng -> dừng scroll")
-                    stop_on_empty = True
-                    break
-
-            except:
-                pass
+                else:
+                    print(f"🛑 Gặp review {rating_text} ngoài cửa sổ -> dừng scroll")
+                stop = True
+                break
 
-        if stop_on_5_star:
-            break
+            if decision == crawl_policy.KEEP:
+                keep.append(i)
 
-        if stop_on_empty:
-            break
+            if crawl_policy.quota_met(policy, tally):
+                print(f"✅ {place_name}: đủ quota ({len(keep)} review)")
+                stop = True
+                break
 
-        # đủ số lượng cần
-        if MAX_REVIEWS > 0 and current_count >= MAX_REVIEWS:
-            print(f"✅ {place_name}: đủ {MAX_REVIEWS} review")
+        if stop:
             break
 
         # không load thêm review mới
@@ -200,94 +254,99 @@ async def run(page, url):
         """)
 
         await page.wait_for_timeout(SCROLL_DELAY)
-        
+
     # =========================
-    # CLICK ALL TRANSLATE BUTTONS
+    # TRANSLATE KEPT REVIEWS
     # =========================
 
+    # chỉ bấm "Xem bản dịch" trong review sẽ lưu
     print("🌐 Translating reviews...")
 
-    while True:
-
-        buttons = page.locator(
-            "button:has-text('Xem bản dịch'), "
-            "button:has-text('See translation')"
-        )
-
-        count = await buttons.count()
+    translated = 0
 
-        if count == 0:
-            break
+    for i in keep:
 
-        print(f"🔘 Remaining translate buttons: {count}")
+        btn = review_blocks.nth(i).locator(css("translate_button"))
 
         try:
-            btn = buttons.first
+            if await btn.count() == 0:
+                continue
 
-            await btn.scroll_into_view_if_needed()
+            await btn.first.scroll_into_view_if_needed()
 
-            await btn.click(timeout=2000, force=True)
+            await btn.first.click(timeout=2000, force=True)
 
             await page.wait_for_timeout(200)
 
+            translated += 1
+
         except Exception as e:
             print("⚠️ Translate error:", e)
-            break
+
+    if translated:
+        print(f"🔘 Translated {translated} reviews")
+
     # =========================
-    # READ REVIEWS
+    # CAPTURE RAW HTML
     # =========================
-    review_blocks = page.locator("div.jftiEf")
-
-    total = await review_blocks.count()
+    if CAPTURE_RAW:
+        try:
+            html = await scroll_box.evaluate("el => el.outerHTML")
+            raw_store.save_capture(url, place_name, html)
+        except Exception as e:
+            print("⚠️ Capture error:", e)
 
-    limit = min(total, MAX_REVIEWS) if MAX_REVIEWS > 0 else total
+    # =========================
+    # READ REVIEWS
+    # =========================
+    review_blocks = page.locator(css("review_block"))
 
     rows = []
 
-    for i in range(limit):
+    for i in keep:
 
         block = review_blocks.nth(i)
 
         try:
-            user = await block.locator("div.d4r55").inner_text()
+            user = await block.locator(css("user")).first.inner_text()
         except:
             user = ""
 
         try:
             rating = await block.locator(
-                "span.kvMYJc"
-            ).get_attribute("aria-label")
+                css("rating")
+            ).first.get_attribute("aria-label")
         except:
             rating = ""
 
         try:
-            time = await block.locator("span.rsqaWe").inner_text()
+            time = await block.locator(css("time")).first.inner_text()
         except:
             time = ""
 
         text = ""
 
         try:
-            if await block.locator("span.wiI7pd").count() > 0:
+            if await block.locator(css("text")).count() > 0:
                 text = await block.locator(
-                    "span.wiI7pd"
-                ).inner_text()
+                    css("text")
+                ).first.inner_text()
         except:
             pass
 
-        clean_text = text.strip()
+        row = review_row(place_name, user, rating, time, text)
 
-        # bỏ review rỗng / quá ngắn
-        if len(clean_text) < 5:
-            continue
+        if row is not None:
+            rows.append(row)
 
-        rows.append({
-            "place_name": place_name,
-            "user": user,
-            "rating": rating,
-            "time": time,
-            "text": clean_text,
-        })
+    # dừng sớm vì review rỗng thì chưa chắc đã thấy text → hỏi lại cả panel
+    if not seen_rating or (
+        checked >= 3 and not seen_text and await page.locator(css("text")).count() == 0
+    ):
+        raise StructuralError(
+            f"{place_name}: {checked} review_block nhưng không đọc được "
+            f"{'rating' if not seen_rating else 'text'}"
+        )
 
     # =========================
     # SAVE CSV
@@ -306,50 +365,141 @@ async def run(page, url):
 
         writer.writerows(rows)
 
+    if conn is not None:
+        place_id = store.upsert_place(conn, place_name, url)
+        store.add_reviews(conn, place_id, rows, os.path.basename(OUTPUT_FILE))
+
     print(f"✅ Saved {len(rows)} reviews")
 
+    return rows
+
+
+# kiểm tra mọi selector trên place đầu tiên trước khi crawl cả danh sách
+async def preflight(page, url):
+
+    await rate_limit.goto(page, force_vietnamese(url), timeout=60000)
+
+    try:
+        await page.wait_for_selector(css("place_name"), timeout=PLACE_TIMEOUT)
+    except Exception:
+        pass
+
+    missing = await maps_selectors.resolve_all(page, maps_selectors.PAGE_KEYS)
+
+    if "review_tab" not in missing:
+        await page.locator(css("review_tab")).first.click()
+        await page.wait_for_timeout(3000)
+
+        missing += await maps_selectors.resolve_all(page, maps_selectors.PANEL_KEYS)
+
+    if "review_block" not in missing and "review_tab" not in missing:
+        block = page.locator(css("review_block")).first
+        missing += await maps_selectors.resolve_all(block, maps_selectors.BLOCK_KEYS)
+    else:
+        missing += maps_selectors.BLOCK_KEYS
+
+    if missing:
+        print(f"❌ Pre-flight (registry {maps_selectors.VERSION}) thiếu selector: {', '.join(missing)}")
+    else:
+        print(f"🧪 Pre-flight (registry {maps_selectors.VERSION}) OK: "
+              + ", ".join(f"{k}={v}" for k, v in maps_selectors.RESOLVED.items()))
+
+    return missing
+
+
+# crawl lần lượt urls trong lc; on_done(url) sau mỗi URL thành công.
+# vẫn bị chặn sau MAX_BLOCK_RETRY lần → dừng, URL chưa xong giữ cho lần chạy sau
+async def crawl(lc, urls, conn, on_done):
+
+    page = await page_lifecycle.current_page(lc)
+
+    try:
+        if urls and await rate_limit.retry_blocked(preflight, page, urls[0]):
+            return
+    except rate_limit.BlockedError as e:
+        print(f"⛔ Pre-flight bị chặn ({e}) → dừng crawl, chạy lại sau")
+        return
+
+    breaker = maps_selectors.new_breaker()
+
+    for url in urls:
+
+        page = await page_lifecycle.current_page(lc)
+
+        try:
+            await rate_limit.retry_blocked(run, page, url, conn)
+
+            maps_selectors.record_success(breaker)
+
+            on_done(url)
+
+        except StructuralError as e:
+            print(f"❌ ERROR: {url}")
+            print(e)
+
+            if maps_selectors.record_failure(breaker, e):
+                break
+
+        except rate_limit.BlockedError as e:
+            print(f"⛔ {url}: {e} → dừng crawl, chạy lại sau")
+            break
+
+        except Exception as e:
+            print(f"❌ ERROR: {url}")
+            print(e)
+
+        await page_lifecycle.task_done(lc)
+
 
 async def main():
 
+    n_done, urls = load_urls()
+
     async with async_playwright() as p:
 
         # =========================
-        # OPEN CHROMIUM ONLY ONCE
+        # OPEN CHROMIUM, TAB MỚI SAU N URL / KHI TỐN RAM
         # =========================
-        browser = await p.chromium.launch_persistent_context(
-            user_data_dir=PROFILE_DIR,
-            headless=False,
-            locale="vi-VN",
-            args=[
-                "--disable-blink-features=AutomationControlled",
-                "--lang=vi-VN",
-                "--start-maximized"
-            ]
-        )
+        async def launch():
+            return await p.chromium.launch_persistent_context(
+                user_data_dir=PROFILE_DIR,
+                headless=False,
+                locale="vi-VN",
+                args=LAUNCH_ARGS
+            )
+
+        lc = page_lifecycle.new_lifecycle(await launch(), relaunch=launch)
 
-        page = await browser.new_page()
+        conn = store.connect() if USE_STORE else None
 
         count = 0
 
-        for url in UNSCRAPED_URLS:
+        def on_done(url):
+            nonlocal count
 
-            if not url.strip():
-                continue
+            count += 1
+
+            with open(URLS_FILE, "w", encoding="utf-8") as f:
+                lines = [str(n_done + count)] + urls
+                f.write("\n".join(lines))
+
+        todo = [u for u in urls[n_done:] if u.strip()]
+
+        await crawl(lc, todo, conn, on_done)
+
+        await page_lifecycle.close(lc)
 
-            try:
-                await run(page, url)
 
-                count += 1
+if __name__ == "__main__":
 
-                with open("urls.txt", "w", encoding="utf-8") as f:
-                    lines = [str(N + count)] + URLS
-                    f.write("\n".join(lines))
+    import argparse
 
-            except Exception as e:
-                print(f"❌ ERROR: {url}")
-                print(e)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--capture-raw", action="store_true")
 
-        await browser.close()
+    args = parser.parse_args()
 
+    if args.capture_raw:
+        CAPTURE_RAW = True
 
-asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,563 @@
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+import features
+
+
+# ======================
+# CONFIG
+# ======================
+
+DB_FILE = "reviews.db"
+
+# tên cột chuẩn; file augmentation cũ dùng "cost" thay cho "price"
+LABEL_COLS = ["food", "service", "place", "price"]
+LEGACY_RENAMES = {"cost": "price"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS places (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    url TEXT UNIQUE,
+    scraped_at REAL
+);
+
+CREATE TABLE IF NOT EXISTS reviews (
+    id INTEGER PRIMARY KEY,
+    place_id INTEGER REFERENCES places(id),
+    -- '' thay cho NULL: SQLite coi mọi NULL khác nhau → UNIQUE không chặn được trùng
+    user TEXT NOT NULL DEFAULT '',
+    rating TEXT,
+    time TEXT,
+    text TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    source_file TEXT,
+    word_count INTEGER,
+    char_len INTEGER,
+    rating_num REAL,
+    has_non_vi INTEGER,
+    UNIQUE (place_id, user, text_hash)
+);
+
+CREATE INDEX IF NOT EXISTS idx_places_name ON places(name);
+CREATE INDEX IF NOT EXISTS idx_reviews_place ON reviews(place_id);
+CREATE INDEX IF NOT EXISTS idx_reviews_text_hash ON reviews(text_hash);
+
+-- label gắn theo text_hash: cùng 1 nội dung chỉ label 1 lần
+CREATE TABLE IF NOT EXISTS labels (
+    text_hash TEXT PRIMARY KEY,
+    food INTEGER,
+    service INTEGER,
+    place INTEGER,
+    price INTEGER,
+    source TEXT,
+    labeled_at REAL
+);
+
+-- review không đưa cho model nữa: bị preprocess loại, hoặc vào dead-letter.
+-- xoá dòng ở đây để label lại
+CREATE TABLE IF NOT EXISTS skipped (
+    text_hash TEXT PRIMARY KEY,
+    reason TEXT,
+    skipped_at REAL
+);
+
+CREATE TABLE IF NOT EXISTS augmentations (
+    id INTEGER PRIMARY KEY,
+    source_text_hash TEXT NOT NULL,
+    original TEXT,
+    text TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    food INTEGER,
+    service INTEGER,
+    place INTEGER,
+    price INTEGER,
+    method TEXT,
+    created_at REAL,
+    word_count INTEGER,
+    char_len INTEGER,
+    has_non_vi INTEGER,
+    UNIQUE (source_text_hash, text_hash)
+);
+
+CREATE INDEX IF NOT EXISTS idx_aug_source ON augmentations(source_text_hash);
+"""
+
+# cột feature (features.py) thêm sau; DB cũ được ALTER + tính bù trong migrate()
+FEATURE_COLUMNS = {
+    "reviews": {
+        "word_count": "INTEGER",
+        "char_len": "INTEGER",
+        "rating_num": "REAL",
+        "has_non_vi": "INTEGER",
+    },
+    "augmentations": {
+        "word_count": "INTEGER",
+        "char_len": "INTEGER",
+        "has_non_vi": "INTEGER",
+    },
+}
+
+VIEW_SCHEMA = """
+CREATE VIEW IF NOT EXISTS v_reviews AS
+SELECT p.name AS place_name, r.user, r.rating, r.time, r.text, r.text_hash, r.source_file,
+       r.word_count, r.char_len, r.rating_num, r.has_non_vi
+FROM reviews r LEFT JOIN places p ON p.id = r.place_id;
+
+CREATE VIEW IF NOT EXISTS v_labeled AS
+SELECT r.place_name, r.user, r.rating, r.time, r.text, r.text_hash,
+       r.word_count, r.char_len, r.rating_num, r.has_non_vi,
+       l.food, l.service, l.place, l.price, l.source AS label_source
+FROM (SELECT * FROM v_reviews GROUP BY text_hash) r
+JOIN labels l ON l.text_hash = r.text_hash;
+
+CREATE VIEW IF NOT EXISTS v_unlabeled AS
+SELECT r.*
+FROM (SELECT * FROM v_reviews GROUP BY text_hash) r
+LEFT JOIN labels l ON l.text_hash = r.text_hash
+LEFT JOIN skipped s ON s.text_hash = r.text_hash
+WHERE l.text_hash IS NULL AND s.text_hash IS NULL;
+
+CREATE VIEW IF NOT EXISTS v_augmented AS
+SELECT a.source_text_hash, a.original, a.text AS augmented,
+       a.food, a.service, a.place, a.price, a.method,
+       a.word_count, a.char_len, a.has_non_vi
+FROM augmentations a;
+"""
+
+VIEWS = ["v_reviews", "v_labeled", "v_unlabeled", "v_augmented"]
+
+# PRAGMA user_version; tăng khi VIEW_SCHEMA / dữ liệu cũ cần migrate() sửa
+# 1: v_unlabeled bỏ review trong bảng skipped
+# 2: text_hash chuẩn hoá NFC + chữ thường (features.text_hash) → hash lại
+SCHEMA_VERSION = 2
+
+
+# ======================
+# CONNECTION
+# ======================
+
+# mỗi process / worker mở connection riêng; WAL cho phép nhiều reader
+# đọc song song với 1 writer, busy_timeout để writer chờ nhau thay vì lỗi
+def connect(db_path=DB_FILE):
+
+    conn = sqlite3.connect(db_path, timeout=30)
+
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    conn.execute("PRAGMA foreign_keys=ON")
+
+    conn.executescript(SCHEMA)
+
+    migrate(conn)
+
+    conn.executescript(VIEW_SCHEMA)
+
+    return conn
+
+
+# thêm cột feature còn thiếu, tính bù cho dòng cũ, xoá view để tạo lại
+# với cột mới. BEGIN IMMEDIATE: nhiều process connect cùng lúc chỉ 1 process ALTER
+def migrate(conn, chunk_size=50000):
+
+    conn.execute("BEGIN IMMEDIATE")
+
+    try:
+        added = {}
+
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+        for table, cols in FEATURE_COLUMNS.items():
+
+            have = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+            for col, col_type in cols.items():
+                if col not in have:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} {col_type}")
+                    added.setdefault(table, []).append(col)
+
+        # DB cũ: review import từ file labeled có user NULL, mỗi lần import lại nhân đôi
+        if conn.execute("SELECT 1 FROM reviews WHERE user IS NULL LIMIT 1").fetchone():
+            removed = conn.execute("""
+                DELETE FROM reviews WHERE id NOT IN (
+                    SELECT MIN(id) FROM reviews GROUP BY place_id, COALESCE(user, ''), text_hash
+                )
+            """).rowcount
+            conn.execute("UPDATE reviews SET user = '' WHERE user IS NULL")
+            print(f"🛠️ Store: user NULL → '', xoá {removed} review trùng")
+
+        if added or version < SCHEMA_VERSION:
+            for view in VIEWS:
+                conn.execute(f"DROP VIEW IF EXISTS {view}")
+
+        if "reviews" in added:
+            backfill(conn, "reviews", "SELECT id, text, rating FROM reviews", chunk_size)
+
+        if "augmentations" in added:
+            backfill(conn, "augmentations", "SELECT id, text FROM augmentations", chunk_size)
+
+        if version < 2:
+            rehash(conn, chunk_size)
+
+        if version < SCHEMA_VERSION:
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+        conn.commit()
+
+    except Exception:
+        conn.rollback()
+        raise
+
+    if added:
+        print(f"🛠️ Store: thêm cột {added}")
+
+
+# hash cũ chỉ gộp khoảng trắng. labels / skipped không lưu text → đổi hash theo
+# review có cùng hash cũ; trùng sau khi chuẩn hoá (NFC vs NFD, hoa/thường) → giữ bản đầu
+def rehash(conn, chunk_size):
+
+    mapping = {}
+
+    for table, text_col, hash_col in [
+        ("reviews", "text", "text_hash"),
+        ("augmentations", "text", "text_hash"),
+        ("augmentations", "original", "source_text_hash"),
+    ]:
+        changed = []
+
+        for chunk in pd.read_sql_query(
+            f"SELECT id, {text_col} AS text, {hash_col} AS old FROM {table}",
+            conn, chunksize=chunk_size
+        ):
+            for row_id, text, old in zip(chunk["id"], chunk["text"], chunk["old"]):
+
+                if text is None:
+                    continue
+
+                new = text_hash(text)
+
+                if new != old:
+                    changed.append((new, int(row_id), old))
+
+                    if table == "reviews":
+                        mapping[old] = new
+
+        conn.executemany(
+            f"UPDATE OR IGNORE {table} SET {hash_col} = ? WHERE id = ? AND {hash_col} = ?",
+            changed
+        )
+
+        # còn hash cũ = đụng UNIQUE với bản đã chuẩn hoá → trùng thật
+        conn.executemany(
+            f"DELETE FROM {table} WHERE id = ? AND {hash_col} = ?",
+            [(row_id, old) for _, row_id, old in changed]
+        )
+
+    for table in ("labels", "skipped"):
+
+        pairs = list(mapping.items())
+
+        conn.executemany(
+            f"UPDATE OR IGNORE {table} SET text_hash = ? WHERE text_hash = ?",
+            [(new, old) for old, new in pairs]
+        )
+        conn.executemany(
+            f"DELETE FROM {table} WHERE text_hash = ?",
+            [(old,) for old, _ in pairs]
+        )
+
+    if mapping:
+        print(f"🛠️ Store: hash lại {len(mapping)} text (NFC + chữ thường)")
+
+
+def backfill(conn, table, query, chunk_size):
+
+    cols = list(FEATURE_COLUMNS[table])
+
+    updates = []
+
+    for chunk in pd.read_sql_query(query, conn, chunksize=chunk_size):
+
+        values = features.add_features(chunk)[cols]
+
+        updates.extend(
+            zip(*(feature_values(values[c]) for c in cols), chunk["id"].tolist())
+        )
+
+    conn.executemany(
+        f"UPDATE {table} SET {', '.join(f'{c} = ?' for c in cols)} WHERE id = ?",
+        updates
+    )
+
+
+# Series → list giá trị SQLite (NaN → NULL, bool → 0/1)
+def feature_values(series):
+
+    if series.dtype == bool:
+        series = series.astype(int)
+
+    return [None if pd.isna(v) else v.item() if hasattr(v, "item") else v for v in series]
+
+
+def text_hash(text):
+    return features.text_hash(text)
+
+
+def normalize_columns(df):
+    return df.rename(columns=LEGACY_RENAMES)
+
+
+# ======================
+# WRITE
+# ======================
+
+# place import từ CSV không có URL → key tạm "name:<tên>".
+# import: dùng lại place cùng tên đã có (ưu tiên bản có URL thật);
+# scrape: place tạm cùng tên được gắn URL thật thay vì tạo place mới
+def upsert_place(conn, name, url=None):
+
+    placeholder = f"name:{name}"
+
+    with conn:
+        if url is None:
+            row = conn.execute("""
+                SELECT id FROM places WHERE name = ?
+                ORDER BY url LIKE 'name:%', id LIMIT 1
+            """, (name,)).fetchone()
+
+            if row is not None:
+                return row[0]
+
+            url = placeholder
+
+        elif not conn.execute("SELECT 1 FROM places WHERE url = ?", (url,)).fetchone():
+            conn.execute("UPDATE places SET url = ? WHERE url = ?", (url, placeholder))
+
+        conn.execute("""
+            INSERT INTO places (name, url, scraped_at) VALUES (?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET name = excluded.name,
+                                           scraped_at = excluded.scraped_at
+        """, (name, url, time.time()))
+
+    return conn.execute("SELECT id FROM places WHERE url = ?", (url,)).fetchone()[0]
+
+
+def add_reviews(conn, place_id, rows, source_file=None):
+
+    if not rows:
+        return 0
+
+    # feature tính 1 lần cho cả batch lúc ghi
+    df = features.add_features(pd.DataFrame(rows).reindex(columns=["user", "rating", "time", "text"]))
+
+    with conn:
+        cur = conn.executemany("""
+            INSERT OR IGNORE INTO reviews
+                (place_id, user, rating, time, text, text_hash, source_file,
+                 word_count, char_len, rating_num, has_non_vi)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, zip(
+            [place_id] * len(df),
+            feature_values(df["user"].fillna("")),
+            feature_values(df["rating"]),
+            feature_values(df["time"]),
+            [r["text"] for r in rows],
+            df["text_hash"],
+            [source_file] * len(df),
+            feature_values(df["word_count"]),
+            feature_values(df["char_len"]),
+            feature_values(df["rating_num"]),
+            feature_values(df["has_non_vi"]),
+        ))
+
+    return cur.rowcount
+
+
+def add_labels(conn, texts, labels, source="model"):
+
+    now = time.time()
+
+    with conn:
+        cur = conn.executemany("""
+            INSERT OR REPLACE INTO labels
+                (text_hash, food, service, place, price, source, labeled_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (text_hash(t), lab["food"], lab["service"], lab["place"], lab["price"], source, now)
+            for t, lab in zip(texts, labels)
+            if lab is not None
+        ])
+
+    return cur.rowcount
+
+
+# review không label được / không cần label → không hiện trong v_unlabeled nữa
+def add_skipped(conn, texts, reason):
+
+    now = time.time()
+
+    with conn:
+        cur = conn.executemany(
+            "INSERT OR IGNORE INTO skipped (text_hash, reason, skipped_at) VALUES (?, ?, ?)",
+            [(text_hash(t), reason, now) for t in texts]
+        )
+
+    return cur.rowcount
+
+
+# rows: dict có original, augmented và 4 label (price hoặc cost)
+def add_augmentations(conn, rows, method):
+
+    now = time.time()
+
+    rows = [{LEGACY_RENAMES.get(k, k): v for k, v in r.items()} for r in rows]
+
+    if not rows:
+        return 0
+
+    aug = features.add_features(pd.DataFrame({"text": [r["augmented"] for r in rows]}))
+
+    records = [
+        (
+            text_hash(r["original"]), r["original"], r["augmented"], h,
+            r.get("food"), r.get("service"), r.get("place"), r.get("price"),
+            method, now, wc, cl, nv,
+        )
+        for r, h, wc, cl, nv in zip(
+            rows,
+            aug["text_hash"],
+            feature_values(aug["word_count"]),
+            feature_values(aug["char_len"]),
+            feature_values(aug["has_non_vi"]),
+        )
+    ]
+
+    with conn:
+        cur = conn.executemany("""
+            INSERT OR IGNORE INTO augmentations
+                (source_text_hash, original, text, text_hash, food, service, place,
+                 price, method, created_at, word_count, char_len, has_non_vi)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, records)
+
+    return cur.rowcount
+
+
+# ======================
+# READ / EXPORT
+# ======================
+
+def read_view(conn, view):
+
+    if view not in VIEWS:
+        raise ValueError(f"Unknown view: {view}")
+
+    return pd.read_sql_query(f"SELECT * FROM {view}", conn)
+
+
+def export_csv(conn, view, path, chunk_size=50000):
+
+    if view not in VIEWS:
+        raise ValueError(f"Unknown view: {view}")
+
+    if os.path.exists(path):
+        os.remove(path)
+
+    total = 0
+
+    for chunk in pd.read_sql_query(f"SELECT * FROM {view}", conn, chunksize=chunk_size):
+        chunk.to_csv(path, mode="a", header=total == 0, index=False)
+        total += len(chunk)
+
+    print(f"💾 {view} → {path}: {total} rows")
+
+
+# ======================
+# IMPORT CSV CŨ
+# ======================
+
+def import_reviews_csv(conn, path):
+
+    df = pd.read_csv(path).dropna(subset=["text"])
+
+    added = 0
+
+    for name, group in df.groupby("place_name", sort=False):
+        place_id = upsert_place(conn, name)
+        added += add_reviews(conn, place_id, group.to_dict("records"), os.path.basename(path))
+
+    return added
+
+
+def import_labeled_csv(conn, path):
+
+    df = normalize_columns(pd.read_csv(path)).dropna(subset=["text"])
+    df = df[df[LABEL_COLS].isin([0, 1, 2, 3]).all(axis=1)]
+
+    # review chưa có trong bảng reviews → thêm để join được
+    if "place_name" in df.columns:
+        import_rows = df
+    else:
+        import_rows = df.assign(place_name="")
+
+    for name, group in import_rows.groupby("place_name", sort=False):
+        place_id = upsert_place(conn, name)
+        add_reviews(conn, place_id, group.to_dict("records"), os.path.basename(path))
+
+    labels = df[LABEL_COLS].astype(int).to_dict("records")
+
+    return add_labels(conn, df["text"].tolist(), labels, source="import")
+
+
+def import_augmented_csv(conn, path, method="llm"):
+
+    df = pd.read_csv(path).dropna(subset=["original", "augmented"])
+
+    return add_augmentations(conn, df.to_dict("records"), method)
+
+
+# ======================
+# CLI
+# ======================
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=DB_FILE)
+
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    exp = sub.add_parser("export")
+    exp.add_argument("view", choices=VIEWS)
+    exp.add_argument("--output", "-o", required=True)
+
+    imp = sub.add_parser("import")
+    imp.add_argument("kind", choices=["reviews", "labeled", "augmented"])
+    imp.add_argument("files", nargs="+")
+
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+
+    if args.command == "export":
+        export_csv(conn, args.view, args.output)
+
+    else:
+        importer = {
+            "reviews": import_reviews_csv,
+            "labeled": import_labeled_csv,
+            "augmented": import_augmented_csv,
+        }[args.kind]
+
+        for path in args.files:
+            try:
+                n = importer(conn, path)
+                print(f"✅ {path}: +{n}")
+            except Exception as e:
+                print(f"❌ Lỗi {path}: {e}")